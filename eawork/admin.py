@@ -7,13 +7,16 @@ from django.shortcuts import redirect
 from django.urls import reverse
 from django_object_actions import DjangoObjectActions
 from enumfields.admin import EnumFieldListFilter
+from solo.admin import SingletonModelAdmin
 
 from eawork.models import Company
+from eawork.models import ImportState
 from eawork.models import JobPost
 from eawork.models import JobPostTag
 from eawork.models import JobPostTagType
 from eawork.models import JobPostTagTypeEnum
 from eawork.models import JobPostVersion
+from eawork.models import SearchIndexEvent
 from eawork.models import User
 from eawork.models.comment import Comment
 from eawork.models.unsubscription import Unsubscription
@@ -93,6 +96,11 @@ class CompanyAdmin(admin.ModelAdmin):
     ]
 
 
+@admin.register(ImportState)
+class ImportStateAdmin(SingletonModelAdmin):
+    pass
+
+
 @admin.register(JobPost)
 class JobPostAdmin(DjangoObjectActions, admin.ModelAdmin):
     list_display = [
@@ -252,3 +260,10 @@ class UnsubscriptionAdmin(admin.ModelAdmin):
     get_query_json.short_description = "Query JSON"
 
     search_fields = ["other_reason"]
+
+
+@admin.register(SearchIndexEvent)
+class SearchIndexEventAdmin(admin.ModelAdmin):
+    list_display = ["model", "object_id", "attempts", "retry_at", "created_at"]
+    list_filter = ["model"]
+    search_fields = ["object_id"]
@@ -22,15 +22,17 @@ class TagTypeSerializer(EnumSupportSerializerMixin, serializers.ModelSerializer)
 
 
 class TagSerializer(serializers.ModelSerializer):
+    count = serializers.IntegerField(source="job_count", read_only=True)
+
     class Meta:
         model = JobPostTag
         fields = [
             "pk",
             "name",
             "is_featured",
-            "link"
+            "link",
             # "types",
-            # "count",
+            "count",
         ]
 
 
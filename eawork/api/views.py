@@ -1,5 +1,4 @@
-from algoliasearch_django import update_records
-from algoliasearch_django.decorators import disable_auto_indexing
+from django.db import transaction
 from django.http import Http404
 from django.urls import reverse
 from django.utils import timezone
@@ -24,6 +23,7 @@ from eawork.models import PostJobTagStatus
 from eawork.models import PostStatus
 from eawork.models import User
 from eawork.send_email import send_email
+from eawork.services.search_index import enqueue_index_events
 
 
 class JobPostVersionViewSet(
@@ -151,7 +151,7 @@ def _create_post_version(
     author: User,
     is_only_version: bool,
 ):
-    with disable_auto_indexing():
+    with transaction.atomic():
         post_version = JobPostVersion.objects.create(
             post=job_post,
             author=author,
@@ -186,7 +186,8 @@ def _add_tags(
             tag = _add_tag(post_version, tag_name=tag_name, tag_type=enum_member, author=author)
             post_version_tag_field.add(tag)
             job_post_tags_pks.append(tag.pk)
-    update_records(model=JobPostTag, qs=JobPost.objects.filter(pk__in=job_post_tags_pks))
+    # the tag records show the number of jobs
+    enqueue_index_events(JobPostTag, job_post_tags_pks)
     return job_post_tags_pks
 
 
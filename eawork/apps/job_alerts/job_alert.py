@@ -1,47 +1,126 @@
-from algoliasearch_django import raw_search
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
 from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import connection
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta, datetime
 
+from eawork.apps.job_alerts.matching import AlertMatcher
+from eawork.apps.job_alerts.rendering import AlertEmailRenderer
 from eawork.models import JobAlert
-from eawork.models import JobPostVersion
+from eawork.send_email import build_email
 from eawork.send_email import send_email
+from eawork.send_email import send_emails
 from eawork.services.email_log import Code, Task, email_log
+from eawork.services.search_backend import SearchBackend
+from eawork.services.search_backend import get_search_backend
+from eawork.services.search_backend import is_search_enabled
+
+
+ALERT_HITS_MAX = 500
 
 
 def check_new_jobs_for_all_alerts():
-    if settings.IS_ENABLE_ALGOLIA:  # todo remove
+    if is_search_enabled():
         print("check new jobs for all alerts")
+        search = get_search_backend()
         nohits = 0
         successes = 0
         failures = 0
 
-        job_alert_count = 0
-
-        total_jobs = get_total_jobs()
-        for job_alert in JobAlert.objects.filter(is_active=True):
-            job_alert_count += 1
-            sent = check_new_jobs(job_alert, total_jobs)
-            if sent is not None:
-                if sent == True:
-                    successes += 1
-                else:
-                    failures += 1
-            else:
-                nohits += 1
-
-        content = f"Job alert count: {job_alert_count}\nAlerts without new emails to send: {nohits}\nSuccessful emails: {successes}\nFailed emails: {failures}"
+        job_alerts = list(JobAlert.objects.filter(is_active=True))
+        job_alert_count = len(job_alerts)
+
+        total_jobs = get_total_jobs(search)
+        # one search for the jobs new to any alert and one per distinct keywords, matched to
+        # all the alerts locally
+        checked_at = [job_alert.last_checked_at for job_alert in job_alerts]
+        jobs_new = get_jobs_posted_after(None if None in checked_at else min(checked_at), search)
+        matcher = AlertMatcher(job_alerts, search)
+        jobs_by_alert = matcher.match(jobs_new, hits_max=ALERT_HITS_MAX)
+        print(f"matched {len(jobs_new)} new jobs to {job_alert_count} alerts")
+
+        chunk_size = settings.JOB_ALERTS["CHUNK_SIZE"]
+        chunks = [
+            job_alerts[start : start + chunk_size]
+            for start in range(0, job_alert_count, chunk_size)
+        ]
+        # the job cards are shared by the emails of all the chunks
+        renderer = AlertEmailRenderer(total_jobs)
+        args = [(chunk, jobs_by_alert, renderer) for chunk in chunks]
+        concurrency = settings.JOB_ALERTS["CONCURRENCY"]
+        if concurrency > 1:
+            with ThreadPoolExecutor(concurrency) as executor:
+                results = list(executor.map(lambda arg: _check_chunk_in_thread(*arg), args))
+        else:
+            # eg in tests, where other threads can't see the data of the test's transaction
+            results = [_check_chunk(*arg) for arg in args]
+        for result in results:
+            nohits += result.nohits
+            successes += result.successes
+            failures += result.failures
+
+        content = f"Job alert count: {job_alert_count}\nAlerts without new emails to send: {nohits}\nSuccessful emails: {successes}\nFailed emails: {failures}\nDistinct queries: {matcher.query_count}\nKeyword searches: {matcher.search_count}"
         print(content)
 
         code = Code.SUCCESS if (nohits > 0 or successes > 0) else Code.FAILURE
         email_log(Task.EMAIL_ALERT, code, content=content)
 
 
+@dataclass
+class ChunkResult:
+    nohits: int = 0
+    successes: int = 0
+    failures: int = 0
+
+
+def _check_chunk_in_thread(*args) -> ChunkResult:
+    try:
+        return _check_chunk(*args)
+    finally:
+        # each thread has its own connection
+        connection.close()
+
+
+def _check_chunk(
+    job_alerts: list[JobAlert],
+    jobs_by_alert: dict[int, list[dict]],
+    renderer: AlertEmailRenderer,
+) -> ChunkResult:
+    result = ChunkResult()
+    messages = []
+    for job_alert in job_alerts:
+        # copies, the hits are annotated per alert
+        hits = [dict(hit) for hit in jobs_by_alert.get(job_alert.pk, [])]
+        if _claim(job_alert, hits):
+            messages.append(_build_email(job_alert, hits, renderer))
+        else:
+            result.nohits += 1
+    for is_sent in send_emails(messages):
+        if is_sent:
+            result.successes += 1
+        else:
+            result.failures += 1
+    return result
+
+
+def get_jobs_posted_after(
+    posted_after: datetime | None, search: SearchBackend = None
+) -> list[dict]:
+    search = search or get_search_backend()
+    params = {"facetFilters": []}
+    if posted_after:
+        params["filters"] = f"posted_at > {posted_after.timestamp()}"
+    return search.search_ranked(query="", params=params)
+
+
 # possible there is an
-def get_total_jobs() -> int:
-    res_json = raw_search(
-        model=JobPostVersion,
+def get_total_jobs(search: SearchBackend = None) -> int:
+    search = search or get_search_backend()
+    res_json = search.search(
         query="",
         params={
             "facetFilters": [],
@@ -55,10 +134,11 @@ def check_new_jobs(
     job_alert: JobAlert,
     total_jobs: int,
     is_send_alert: bool = True,
-    algolia_hits_per_page: int = 500,
+    algolia_hits_per_page: int = ALERT_HITS_MAX,
+    search: SearchBackend = None,
 ):
-    res_json = raw_search(
-        model=JobPostVersion,
+    search = search or get_search_backend()
+    res_json = search.search(
         query=job_alert.query_json.get("query", "") if job_alert.query_json else "",
         params={
             "facetFilters": job_alert.query_json.get("facetFilters", [])
@@ -69,53 +149,52 @@ def check_new_jobs(
         },
     )
 
-    sent = None
-
-    if res_json["hits"]:
-        jobs_new = []
-
-        any_closing_soon = False
-        for hit in res_json["hits"]:
-            hit["closing_soon"] = False
-            if "closes_at" in hit and type(hit["closes_at"]) == int:
-                hit["closing_soon"] = ((timezone.now() + timedelta(7)).timestamp()) > hit[
-                    "closes_at"
-                ]
-
-                any_closing_soon = True
-            jobs_new.append(hit)
-
-        if is_send_alert:
-            sent = _send_email(
-                job_alert, jobs_new, any_closing_soon, total_jobs
-            )  # sent is overwritten with a bool to indicate the success status of an email
+    return _process_hits(job_alert, res_json["hits"], total_jobs, is_send_alert=is_send_alert)
 
-        job_alert.last_checked_at = timezone.now()
-        job_alert.save()
 
-    return sent  # if sent was not overwritten, its value remains None, indicating that there was nothing to send.
-
-
-def _send_email(
-    job_alert: JobAlert, jobs_new: list[dict], any_closing_soon: bool, total_count: int
+def _process_hits(
+    job_alert: JobAlert, hits: list[dict], total_jobs: int, is_send_alert: bool = True
 ):
-    query_string = job_alert.generate_query_string()
-
-    matched_count = len(jobs_new)
-
-    return send_email(
+    # None indicates that there was nothing to send
+    if not _claim(job_alert, hits) or not is_send_alert:
+        return None
+    return send_emails([_build_email(job_alert, hits, AlertEmailRenderer(total_jobs))])[0]
+
+
+def _claim(job_alert: JobAlert, hits: list[dict]) -> bool:
+    if not hits:
+        return False
+    # claimed before sending, so a retried or concurrent run skips the alert instead of
+    # sending it twice
+    checked_at = timezone.now()
+    is_claimed = JobAlert.objects.filter(
+        pk=job_alert.pk, last_checked_at=job_alert.last_checked_at
+    ).update(last_checked_at=checked_at, updated_at=checked_at)
+    if not is_claimed:
+        print(f"job alert {job_alert.pk} was already checked")
+        return False
+    job_alert.last_checked_at = checked_at
+    return True
+
+
+def _build_email(
+    job_alert: JobAlert, jobs_new: list[dict], renderer: AlertEmailRenderer
+) -> EmailMultiAlternatives:
+    any_closing_soon = False
+    for hit in jobs_new:
+        hit["closing_soon"] = False
+        if "closes_at" in hit and type(hit["closes_at"]) == int:
+            hit["closing_soon"] = ((timezone.now() + timedelta(7)).timestamp()) > hit[
+                "closes_at"
+            ]
+
+            any_closing_soon = True
+
+    content = renderer.render(job_alert, jobs_new, any_closing_soon)
+    return build_email(
         subject="New Jobs Alert",
-        template_name="job_alerts/job_alert.html",
-        template_context={
-            "url_unsubscribe": reverse(
-                "api_ninja:jobs_unsubscribe", kwargs={"token": job_alert.unsubscribe_token}
-            ),
-            "jobs_new": jobs_new,
-            "query_string": query_string,
-            "any_closing_soon": any_closing_soon,
-            "matched_count": matched_count,
-            "total_count": total_count,
-        },
+        content_html=content.html,
+        content_txt=content.text,
         email_to=[job_alert.email],
     )
 
@@ -0,0 +1,159 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from dataclasses import field
+
+from eawork.models import JobAlert
+from eawork.services.search_backend import SearchBackend
+from eawork.services.search_backend import get_facet_values
+
+
+# alerts checked within the same bucket share one query
+CHECKED_AT_BUCKET_SECONDS = 60 * 60
+
+
+@dataclass
+class CompiledQuery:
+    text: str  # the keywords, matched by the search backend
+    # every group must match one of its (attribute, value, is_negated) filters
+    facet_groups: tuple[tuple[tuple[str, str, bool], ...], ...]
+    posted_after: float
+    job_alerts: list[JobAlert] = field(default_factory=list)
+
+    def is_match(
+        self, job: dict, job_facets: set[tuple[str, str]], ranks: dict[str, dict[str, int]]
+    ) -> bool:
+        if (job.get("posted_at") or 0) <= self.posted_after:
+            return False
+        for group in self.facet_groups:
+            if not any(
+                ((attribute, value) in job_facets) != is_negated
+                for attribute, value, is_negated in group
+            ):
+                return False
+        return not self.text or job["objectID"] in ranks[self.text]
+
+
+class AlertMatcher:
+    """
+    Matches a set of jobs to all the alerts in one pass, instead of a search per alert.
+
+    The alerts with the same canonical query, checked within the same hour, are grouped into
+    one query, matched with the earliest `last_checked_at` of the group. Each query is filed
+    under the values of its first facet group, so a job is only checked against the queries
+    that can match one of its facet values, plus the few queries without such a group. The
+    facets are matched locally, the keywords by one search per distinct keywords, so with the
+    typo tolerance, ranking and searchable attributes of the index.
+    """
+
+    def __init__(self, job_alerts: list[JobAlert], search: SearchBackend):
+        self.search = search
+        self.queries: dict[tuple, CompiledQuery] = {}
+        for job_alert in job_alerts:
+            query = _compile(job_alert)
+            key = (query.text, query.facet_groups, _get_checked_at_bucket(job_alert))
+            query = self.queries.setdefault(key, query)
+            query.posted_after = min(query.posted_after, _get_posted_after(job_alert))
+            query.job_alerts.append(job_alert)
+
+        self.posted_after_by_text: dict[str, float] = {}
+        for query in self.queries.values():
+            if query.text:
+                self.posted_after_by_text[query.text] = min(
+                    query.posted_after,
+                    self.posted_after_by_text.get(query.text, query.posted_after),
+                )
+
+        self.queries_by_facet: dict[tuple[str, str], list[CompiledQuery]] = defaultdict(list)
+        self.queries_unfiled: list[CompiledQuery] = []
+        for query in self.queries.values():
+            group_first = query.facet_groups[0] if query.facet_groups else ()
+            if group_first and not any(is_negated for _, _, is_negated in group_first):
+                for attribute, value, _ in group_first:
+                    self.queries_by_facet[(attribute, value)].append(query)
+            else:
+                self.queries_unfiled.append(query)
+
+    @property
+    def query_count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def search_count(self) -> int:
+        return len(self.posted_after_by_text)
+
+    def match(self, jobs: list[dict], hits_max: int = None) -> dict[int, list[dict]]:
+        """
+        Returns the matched jobs by alert pk, in the ranking order of the keywords search, or
+        in the order of `jobs` for the alerts without keywords.
+        """
+        ranks = {
+            text: self._get_ranks(text, posted_after)
+            for text, posted_after in self.posted_after_by_text.items()
+        }
+        jobs_by_query: dict[int, list[dict]] = defaultdict(list)
+        for job in jobs:
+            job_facets = {
+                (attribute, facet_value)
+                for attribute, value in job.items()
+                for facet_value in get_facet_values(value)
+            }
+            queries_candidate = {
+                id(query): query
+                for facet in job_facets
+                for query in self.queries_by_facet.get(facet, [])
+            }
+            for query in [*queries_candidate.values(), *self.queries_unfiled]:
+                if query.is_match(job, job_facets, ranks):
+                    jobs_by_query[id(query)].append(job)
+        for query in self.queries.values():
+            if query.text:
+                jobs_by_query[id(query)].sort(key=lambda job: ranks[query.text][job["objectID"]])
+
+        # fanned out to the alerts of each query, by their own last_checked_at
+        jobs_by_alert: dict[int, list[dict]] = {}
+        for query in self.queries.values():
+            jobs_matched = jobs_by_query.get(id(query), [])
+            for job_alert in query.job_alerts:
+                posted_after = _get_posted_after(job_alert)
+                jobs_alert = [
+                    job for job in jobs_matched if (job.get("posted_at") or 0) > posted_after
+                ]
+                jobs_by_alert[job_alert.pk] = jobs_alert[:hits_max]
+        return jobs_by_alert
+
+    def _get_ranks(self, text: str, posted_after: float) -> dict[str, int]:
+        hits = self.search.search_ranked(
+            query=text,
+            params={
+                "filters": f"posted_at > {posted_after}",
+                "attributesToRetrieve": ["objectID"],
+            },
+        )
+        return {hit["objectID"]: rank for rank, hit in enumerate(hits)}
+
+
+def _compile(job_alert: JobAlert) -> CompiledQuery:
+    query_json = job_alert.query_json or {}
+    facet_groups = set()
+    for facet_filter in query_json.get("facetFilters") or []:
+        group = set()
+        facet_filters_or = facet_filter if isinstance(facet_filter, list) else [facet_filter]
+        for facet_filter_single in facet_filters_or:
+            attribute, _, value = facet_filter_single.partition(":")
+            is_negated = value.startswith("-")
+            group.add((attribute, value[1:] if is_negated else value, is_negated))
+        facet_groups.add(tuple(sorted(group)))
+    return CompiledQuery(
+        # Algolia ignores the case and the spaces around the words
+        text=" ".join((query_json.get("query") or "").casefold().split()),
+        facet_groups=tuple(sorted(facet_groups)),
+        posted_after=_get_posted_after(job_alert),
+    )
+
+
+def _get_posted_after(job_alert: JobAlert) -> float:
+    return job_alert.last_checked_at.timestamp() if job_alert.last_checked_at else 0
+
+
+def _get_checked_at_bucket(job_alert: JobAlert) -> int:
+    return int(_get_posted_after(job_alert) // CHECKED_AT_BUCKET_SECONDS)
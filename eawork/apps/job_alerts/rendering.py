@@ -0,0 +1,119 @@
+import re
+import threading
+from dataclasses import dataclass
+
+import html2text
+from django.conf import settings
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.html import escape
+
+from eawork.models import JobAlert
+
+
+# stand-ins for the per-subscriber values, rendered into the cached frames, html2text keeps
+# them as they are
+PLACEHOLDERS = {
+    "jobs_html": "EAWORKALERTJOBS",
+    "query_string": "EAWORKALERTQUERYSTRING",
+    "url_unsubscribe": "EAWORKALERTURLUNSUBSCRIBE",
+}
+PLACEHOLDER_PATTERN = re.compile("|".join(PLACEHOLDERS.values()))
+
+
+@dataclass
+class Fragment:
+    html: str
+    text: str
+
+
+class AlertEmailRenderer:
+    """
+    Renders the job alert emails of one run, from the job cards and the email frames that are
+    rendered, and converted to text, once per run.
+
+    A frame is `job_alerts/job_alert.html` for a given job count, with placeholders for the
+    cards and the per-subscriber links, so an email only costs the string substitutions.
+
+    Shared by the threads sending the chunks of a run, a fragment rendered by two of them at
+    once is rendered twice but cached once.
+    """
+
+    def __init__(self, total_count: int):
+        self.total_count = total_count
+        self._cards: dict[tuple, Fragment] = {}
+        self._frames: dict[tuple, Fragment] = {}
+        self._lock = threading.Lock()
+
+    def render(
+        self, job_alert: JobAlert, jobs_new: list[dict], any_closing_soon: bool
+    ) -> Fragment:
+        frame = self._get_frame(len(jobs_new), any_closing_soon)
+        cards = [self._get_card(job) for job in jobs_new]
+        query_string = job_alert.generate_query_string()
+        url_unsubscribe = reverse(
+            "api_ninja:jobs_unsubscribe", kwargs={"token": job_alert.unsubscribe_token}
+        )
+        return Fragment(
+            html=_fill(
+                frame.html,
+                jobs_html="".join(card.html for card in cards),
+                query_string=escape(query_string),
+                url_unsubscribe=escape(url_unsubscribe),
+            ),
+            text=_fill(
+                frame.text,
+                jobs_html="\n".join(card.text for card in cards),
+                query_string=query_string,
+                url_unsubscribe=url_unsubscribe,
+            ),
+        )
+
+    def _get_card(self, job: dict) -> Fragment:
+        key = (job["objectID"], job.get("closing_soon", False))
+        with self._lock:
+            card = self._cards.get(key)
+        if card is None:
+            html = _render_html("job_alerts/job_card.html", {"job": job})
+            # converted inside its list, like in the whole email
+            text = html2text.html2text(f"<ul>{html}</ul>").strip("\n")
+            with self._lock:
+                card = self._cards.setdefault(key, Fragment(html=html, text=text))
+        return card
+
+    def _get_frame(self, matched_count: int, any_closing_soon: bool) -> Fragment:
+        key = (matched_count, any_closing_soon)
+        with self._lock:
+            frame = self._frames.get(key)
+        if frame is None:
+            html = _render_html(
+                "job_alerts/job_alert.html",
+                {
+                    **PLACEHOLDERS,
+                    "any_closing_soon": any_closing_soon,
+                    "matched_count": matched_count,
+                    "total_count": self.total_count,
+                },
+            )
+            text = html2text.html2text(html)
+            with self._lock:
+                frame = self._frames.setdefault(key, Fragment(html=html, text=text))
+        return frame
+
+
+def _render_html(template_name: str, context: dict) -> str:
+    return get_template(template_name).render(
+        {
+            "settings": {
+                "BASE_URL": settings.BASE_URL,
+                "FRONTEND_URL": settings.FRONTEND_URL,
+            },
+            **context,
+        }
+    )
+
+
+# in one pass, so a job title can't inject a placeholder
+def _fill(content: str, **values: str) -> str:
+    values_by_placeholder = {PLACEHOLDERS[name]: value for name, value in values.items()}
+    return PLACEHOLDER_PATTERN.sub(lambda match: values_by_placeholder[match.group()], content)
@@ -1,19 +1,26 @@
 import datetime
 import json
 import time
+from datetime import timedelta
 
 import pytz
 from algoliasearch_django import clear_index
 from dateutil.relativedelta import relativedelta
 from django.core import mail
+from django.test import override_settings
+from django.utils import timezone
 
 from eawork.apps.job_alerts.job_alert import check_new_jobs_for_all_alerts
+from eawork.apps.job_alerts.matching import AlertMatcher
 from eawork.models import JobAlert
 from eawork.models import JobPost
 from eawork.models import JobPostTag
 from eawork.models import JobPostVersion
-from eawork.services.import_80_000_hours import import_80_000_hours_jobs
+from eawork.services.search_backend import LocalSearchBackend
+from eawork.services.search_backend import SearchBackend
+from eawork.tasks import import_80_000_hours_jobs
 from eawork.tests.cases import EAWorkTestCase
+from eawork.tests.cases import SyntheticImportTestCase
 
 
 class JobCreateTest(EAWorkTestCase):
@@ -102,3 +109,152 @@ class JobCreateTest(EAWorkTestCase):
         time.sleep(self.algolia_caching_time_s)
 
         return JobPost.objects.get(version_current=post_version)
+
+
+class AlertMatcherTest(SyntheticImportTestCase):
+    def test_matches_like_a_search_per_alert(self):
+        versions = JobPostVersion.objects.should_submit_to_algolia()
+        tag, tag_other = JobPostTag.objects.filter(tags_area_filter__in=versions).distinct()[:2]
+        version = versions.order_by("posted_at").last()
+        posted_at_median = versions.order_by("posted_at")[versions.count() // 2].posted_at
+        area, area_other = f"tags_area:{tag.name}", f"tags_area:{tag_other.name}"
+        queries = [
+            None,
+            {"query": "", "facetFilters": [[area]]},
+            {"query": "", "facetFilters": [[area, area_other]]},
+            {"query": "", "facetFilters": [f"tags_area:-{tag.name}"]},
+            {"query": version.title[:-1], "facetFilters": []},
+        ]
+        job_alerts = [
+            JobAlert.objects.create(
+                email=f"alert{i}@example.org",
+                query_json=query_json,
+                last_checked_at=last_checked_at,
+            )
+            for i, query_json in enumerate(queries)
+            for last_checked_at in [timezone.now() - timedelta(days=3650), posted_at_median]
+        ]
+
+        search = LocalSearchBackend()
+        jobs = search.search("", {"hitsPerPage": 1000})["hits"]
+        jobs_by_alert = AlertMatcher(job_alerts, search).match(jobs)
+        for job_alert in job_alerts:
+            query_json = job_alert.query_json or {}
+            res = search.search(
+                query_json.get("query", ""),
+                {
+                    "facetFilters": query_json.get("facetFilters", []),
+                    "filters": f"posted_at > {job_alert.last_checked_at.timestamp()}",
+                    "hitsPerPage": 1000,
+                },
+            )
+            self.assertEqual(
+                [job["objectID"] for job in jobs_by_alert.get(job_alert.pk, [])],
+                [hit["objectID"] for hit in res["hits"]],
+                job_alert.query_json,
+            )
+
+    def test_identical_queries_run_once(self):
+        checked_at = timezone.now() - timedelta(days=3650)
+        query_jsons = [
+            {"query": "Research", "facetFilters": [["tags_area:a", "tags_area:b"]]},
+            {"query": "research ", "facetFilters": [["tags_area:b", "tags_area:a"]]},
+            {"query": "", "facetFilters": []},
+            None,
+        ]
+        job_alerts = [
+            JobAlert.objects.create(
+                email="alert@example.org", query_json=query_json, last_checked_at=checked_at
+            )
+            for query_json in query_jsons
+        ]
+        matcher = AlertMatcher(job_alerts, LocalSearchBackend())
+        self.assertEqual(matcher.query_count, 2)
+        self.assertEqual(matcher.search_count, 1)
+
+
+class RankedSearchBackend(SearchBackend):
+    """Answers with the given hits per query, in their order, like Algolia ranks them."""
+
+    def __init__(self, hits_by_query: dict[str, list[dict]]):
+        self.hits_by_query = hits_by_query
+        self.queries = []
+
+    def search(self, query: str = "", params: dict = None) -> dict:
+        self.queries.append(query)
+        hits = self.hits_by_query.get(query, [])
+        return {"hits": hits, "nbHits": len(hits), "page": 0, "nbPages": 1}
+
+
+class AlertMatcherAlgoliaHitsTest(EAWorkTestCase):
+    def test_keywords_are_matched_by_the_search_backend(self):
+        posted_at = (timezone.now() - timedelta(hours=1)).timestamp()
+        jobs = [
+            {"objectID": 1, "title": "Researcher", "visa_sponsorship": "Yes"},
+            {"objectID": 2, "title": "Research Analyst", "visa_sponsorship": "No"},
+            {"objectID": 3, "title": "Résearch Lead", "visa_sponsorship": "Yes"},
+            {"objectID": 4, "title": "Operations", "visa_sponsorship": "Yes"},
+        ]
+        for job in jobs:
+            job["posted_at"] = posted_at
+        # typo and accent tolerant, ranked by relevance
+        search = RankedSearchBackend(
+            {"reserch": [{"objectID": 3}, {"objectID": 2}, {"objectID": 1}]}
+        )
+        checked_at = timezone.now() - timedelta(days=1)
+        job_alerts = [
+            JobAlert.objects.create(
+                email=f"alert{i}@example.org", query_json=query_json, last_checked_at=checked_at
+            )
+            for i, query_json in enumerate(
+                [
+                    {"query": "Reserch", "facetFilters": ["visa_sponsorship:Yes"]},
+                    {"query": "reserch ", "facetFilters": []},
+                    {"query": "", "facetFilters": [["visa_sponsorship:No"]]},
+                ]
+            )
+        ]
+
+        matcher = AlertMatcher(job_alerts, search)
+        jobs_by_alert = matcher.match(jobs)
+        self.assertEqual(
+            [[job["objectID"] for job in jobs_by_alert[alert.pk]] for alert in job_alerts],
+            [[3, 1], [3, 2, 1], [2]],
+        )
+        self.assertEqual(search.queries, ["reserch"])
+
+        jobs_by_alert = matcher.match(jobs, hits_max=1)
+        self.assertEqual([job["objectID"] for job in jobs_by_alert[job_alerts[0].pk]], [3])
+
+
+@override_settings(SEARCH_BACKEND="local", JOB_ALERTS={"CONCURRENCY": 1, "CHUNK_SIZE": 2})
+class CheckNewJobsTest(SyntheticImportTestCase):
+    synthetic_vacancies = 20
+
+    def test_sends_each_alert_once(self):
+        checked_at = timezone.now() - timedelta(days=3650)
+        for i in range(5):
+            JobAlert.objects.create(
+                email=f"alert{i}@example.org", query_json=None, last_checked_at=checked_at
+            )
+
+        check_new_jobs_for_all_alerts()
+        emails_alert = [email for email in mail.outbox if email.subject == "New Jobs Alert"]
+        self.assertEqual(
+            sorted(email.to[0] for email in emails_alert),
+            [f"alert{i}@example.org" for i in range(5)],
+        )
+
+        # assembled from the shared job cards, with the subscriber's own links
+        jobs_count = JobPostVersion.objects.should_submit_to_algolia().count()
+        for email in emails_alert:
+            job_alert = JobAlert.objects.get(email=email.to[0])
+            html = email.alternatives[0][0]
+            self.assertIn(f"/unsubscribe/{job_alert.unsubscribe_token}", html)
+            self.assertIn(f"/unsubscribe/{job_alert.unsubscribe_token}", email.body)
+            self.assertEqual(html.count("<li>"), jobs_count)
+            self.assertEqual(email.body.count("  * ["), jobs_count)
+
+        mail.outbox = []
+        check_new_jobs_for_all_alerts()
+        self.assertFalse([email for email in mail.outbox if email.subject == "New Jobs Alert"])
@@ -16,6 +16,7 @@ from eawork.apps.job_alerts.newsletter import (
 from eawork.models import JobAlert, job_alert
 from eawork.models import unsubscription
 from eawork.models.unsubscription import Unsubscription
+from eawork.services.search_backend import get_search_backend
 from .forms import UnsubscribeForm
 from sentry_sdk import capture_exception, capture_message
 from ninja.errors import HttpError
@@ -84,8 +85,9 @@ def jobs_subscribe(request, job_alert_req: JobAlertReq):
         query_json=job_alert_req.query_json,
     )
 
-    total = get_total_jobs()
-    check_new_jobs(job_alert, total, is_send_alert=False)
+    search = get_search_backend()
+    total = get_total_jobs(search)
+    check_new_jobs(job_alert, total, is_send_alert=False, search=search)
     send_confirmation(email=job_alert_req.email, unsubscribe_token=job_alert.unsubscribe_token)
     return {"success": True}
 
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from eawork.services.import_benchmark import get_report
+from eawork.services.import_benchmark import run_import_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the import phases on synthetic data and prints or saves a JSON report. "
+        "The writes are rolled back, but use a local database. Works on Postgres and SQLite, "
+        "the report records which one ran it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sizes", type=int, nargs="*", default=[100, 1000, 10000])
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Path of the JSON report, printed if omitted")
+        parser.add_argument(
+            "--no-memory",
+            action="store_true",
+            help="Skip the peak memory tracing, which slows the phases down",
+        )
+
+    def handle(self, *args, **options):
+        is_trace_memory = not options["no_memory"]
+        results = run_import_benchmark(
+            options["sizes"], seed=options["seed"], is_trace_memory=is_trace_memory
+        )
+        report = json.dumps(get_report(results, is_trace_memory), indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(report)
+        else:
+            print(report)
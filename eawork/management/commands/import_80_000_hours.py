@@ -6,7 +6,21 @@ from eawork.tasks import import_80_000_hours_jobs
 class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("limit", type=int, nargs="?", default=False)
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only fetch the airtable records modified since the last successful sync",
+        )
+        parser.add_argument(
+            "--reindex",
+            action="store_true",
+            help="Rebuild the Algolia indices instead of only pushing the changed records",
+        )
 
     def handle(self, *args, **options):
         # does not use celery for now for sake of synchronicity with check_new_jobs_for_all_alerts command
-        import_80_000_hours_jobs(limit=options["limit"])
+        import_80_000_hours_jobs(
+            limit=options["limit"],
+            is_incremental=options["incremental"],
+            is_reindex=options["reindex"],
+        )
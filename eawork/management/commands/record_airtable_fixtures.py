@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from eawork.services import airtable
+from eawork.services.airtable_utils import recorded
+
+
+class Command(BaseCommand):
+    help = "Saves the airtable tables used by the import as JSON for the recorded source"
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixtures_dir", nargs="?", default=settings.AIRTABLE["FIXTURES_DIR"])
+
+    def handle(self, *args, **options):
+        # fetched from the configured source, so AIRTABLE_SOURCE=synthetic records generated data
+        tables = {
+            "!Dropdowns": airtable.get_raw_dropdown_data(),
+            "!Locations": airtable.get_raw_locations_data(),
+            "!Vacancies": airtable.get_raw_vacancy_data(),
+            "!Orgs": airtable.get_raw_organisation_data(),
+        }
+        for table_name, records in tables.items():
+            recorded.save_table(options["fixtures_dir"], table_name, records)
+            print(f"{table_name}: {len(records)} records")
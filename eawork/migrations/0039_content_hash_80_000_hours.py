@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:55
+
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eawork", "0038_company_headquarters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="company",
+            name="content_hash_80_000_hours",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="jobpost",
+            name="content_hash_80_000_hours",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
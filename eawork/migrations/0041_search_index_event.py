@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:26
+
+import django.utils.timezone
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eawork", "0040_import_state"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchIndexEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("model", models.CharField(max_length=255)),
+                ("object_id", models.CharField(max_length=255)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                (
+                    "retry_at",
+                    models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:28
+
+from django.db import migrations
+from django.db import models
+
+
+def refresh_projections(apps, schema_editor):
+    from eawork.services.companies import refresh_company_projections
+
+    Company = apps.get_model("eawork", "Company")
+    refresh_company_projections(list(Company.objects.values_list("pk", flat=True)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eawork", "0041_search_index_event"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="company",
+            name="search_projection",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(refresh_projections, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:30
+
+from django.db import migrations
+from django.db import models
+
+
+def refresh_counts(apps, schema_editor):
+    from eawork.services.tags import refresh_tag_counts
+
+    refresh_tag_counts()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eawork", "0042_company_search_projection"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="jobposttag",
+            name="job_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(refresh_counts, migrations.RunPython.noop),
+    ]
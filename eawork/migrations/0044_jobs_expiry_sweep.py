@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:34
+
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eawork", "0043_tag_job_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importstate",
+            name="jobs_expired_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="jobpostversion",
+            name="closes_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -1,8 +1,10 @@
 from .comment import *
 from .tag import *
 from .company import *
+from .import_state import *
 from .job_alert import *
 from .job_post import *
 from .post import *
+from .search_index_event import *
 from .user import *
 from .unsubscription import *
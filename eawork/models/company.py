@@ -2,14 +2,15 @@ from django.db import models
 from typing import List
 from eawork.models.user import User
 from eawork.models.tag import JobPostTag, JobPostTagTypeEnum
-from django.apps import apps
 from django.utils import timezone
+from datetime import datetime
 from datetime import timedelta
 
 
 class Company(models.Model):
     name = models.CharField(max_length=128)
     id_external_80_000_hours = models.CharField(max_length=511, blank=True)
+    content_hash_80_000_hours = models.CharField(max_length=64, blank=True)  # of the last import
     description = models.TextField(blank=True)  # markdown
     description_short = models.TextField(blank=True)  # markdown
     logo_url = models.URLField(max_length=511, blank=True)
@@ -53,6 +54,8 @@ class Company(models.Model):
         blank=True,
         related_name=f"tags_locations",
     )
+    # the data of the algolia record from the jobs and tags, see eawork.services.companies
+    search_projection = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -61,27 +64,17 @@ class Company(models.Model):
         verbose_name_plural = "companies"
 
     def get_posts(self) -> List:
-        posts = apps.get_model("eawork", "JobPost")
-
         arr = []
-        for post in posts.objects.filter(company__name=self.name):
-            vc = post.version_current
+        for post in self.search_projection.get("posts", []):
+            closes_at = post["closes_at"] and datetime.fromisoformat(post["closes_at"])
 
+            # checked here, a job can close long after the projection was refreshed
             is_active = True
-            if vc.closes_at is not None:
-                is_active = timezone.now() <= (vc.closes_at + timedelta(1))
+            if closes_at is not None:
+                is_active = timezone.now() <= (closes_at + timedelta(1))
 
             if is_active:
-                d = {
-                    "pk": vc.pk,
-                    "title": vc.title,
-                    "salary": vc.salary,
-                    "visa_sponsorship": vc.visa_sponsorship,
-                    "problem_areas": vc.get_tags_area_formatted(),
-                    "experience_required": vc.get_tags_exp_required_formatted(),
-                    "closes_at": vc.closes_at,
-                }
-                arr.append(d)
+                arr.append({**post, "closes_at": closes_at})
 
         return arr
 
@@ -90,12 +83,10 @@ class Company(models.Model):
         return len(posts)
 
     def get_locations(self) -> list[str]:
-        return [tag.name.replace(".", ", ") for tag in self.tags_locations.all()]
+        return self.search_projection.get("locations", [])
 
     def get_problem_areas(self) -> list[str]:
-        return [tag.name for tag in self.tags_areas.all()]
+        return self.search_projection.get("problem_areas", [])
 
     def get_hq(self) -> list[str]:
-        if self.headquarters is None:
-            return ""
-        return self.headquarters.name
+        return self.search_projection.get("hq", "")
@@ -0,0 +1,12 @@
+from django.db import models
+from solo.models import SingletonModel
+
+
+class ImportState(SingletonModel):
+    # watermark for the incremental airtable sync, only advanced after a successful import
+    airtable_synced_at = models.DateTimeField(null=True, blank=True)
+    # the jobs that expired before it are deleted from the index by the expiry sweep
+    jobs_expired_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return "Import state"
@@ -1,5 +1,7 @@
 import html2text
 from django.db import models
+from django.db.models import F
+from django.db.models import Q
 from django.utils import timezone
 from eawork.models.tag import JobPostTag, JobPostTagTypeEnum, PostJobTagStatus
 from datetime import timedelta
@@ -28,6 +30,20 @@ class JobPost(Post):
     )
     id_external_80_000_hours = models.CharField(max_length=255, blank=True)
     is_refetch_from_80_000_hours = models.BooleanField(default=False)
+    content_hash_80_000_hours = models.CharField(max_length=64, blank=True)  # of the last import
+
+    # the saved version_current, which eawork.services.tags compares on save
+    _version_current_id_saved = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        post._version_current_id_saved = post.__dict__.get("version_current_id")
+        return post
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._version_current_id_saved = self.version_current_id
 
     def __str__(self):
         if self.version_current:
@@ -36,7 +52,25 @@ class JobPost(Post):
             return str(self.pk)
 
 
+# all the tag M2M fields of JobPostVersion
+JOB_POST_VERSION_TAG_FIELDS = [
+    f"tags_{enum_member.value}" for enum_member in JobPostTagTypeEnum
+] + ["tags_area_filter"]
+
+
+class JobPostVersionQuerySet(models.QuerySet):
+    def should_submit_to_algolia(self) -> "JobPostVersionQuerySet":
+        # the rule of JobPostVersion.is_should_submit_to_algolia, keep them in line
+        return self.filter(
+            Q(closes_at__isnull=True) | Q(closes_at__gte=timezone.now() - timedelta(1)),
+            post__version_current=F("pk"),
+            status=PostStatus.PUBLISHED,
+        )
+
+
 class JobPostVersion(PostVersion):
+    objects = JobPostVersionQuerySet.as_manager()
+
     post = models.ForeignKey(
         JobPost,
         on_delete=models.CASCADE,
@@ -45,7 +79,7 @@ class JobPostVersion(PostVersion):
         blank=True,
     )
 
-    closes_at = models.DateTimeField(null=True, blank=True)
+    closes_at = models.DateTimeField(null=True, blank=True, db_index=True)
     posted_at = models.DateTimeField(null=True, blank=True)
 
     url_external = models.URLField(blank=True, max_length=1023)
@@ -149,13 +183,14 @@ class JobPostVersion(PostVersion):
     def publish(self):
         self.post.version_current = self
         self.post.is_refetch_from_80_000_hours = False
+        self.post.content_hash_80_000_hours = ""  # so a re-enabled refetch rewrites the version
         self.post.save()
         self.status = PostStatus.PUBLISHED
         self.save()
 
     @property
     def get_post_pk(self) -> int:
-        return self.post.pk
+        return self.post_id
 
     def get_tags_area_formatted(self) -> list[str]:
         return [tag.name for tag in self.tags_area.all()]
@@ -243,7 +278,7 @@ class JobPostVersion(PostVersion):
             if self.closes_at:
                 is_active = timezone.now() <= (self.closes_at + timedelta(1))
 
-            if not self.post.version_current:
+            if not self.post.version_current_id:
                 str = f"Post {self.post.pk} has no version_current field. Please check Post {self.post.pk} and PostVersion {self.pk}."
                 print(str)
                 logging.error(str)
@@ -251,13 +286,13 @@ class JobPostVersion(PostVersion):
 
             factors = (
                 is_active
-                and (self.post.version_current.pk == self.pk)
+                and (self.post.version_current_id == self.pk)
                 and (self.status == PostStatus.PUBLISHED)
             )
 
             if not factors:
-                print(
-                    f"Factors: is active: {is_active}, close date: {self.closes_at}, current version pk: {self.post.version_current.pk} self pk: {self.pk} status: {self.status}"
+                logging.debug(
+                    f"Factors: is active: {is_active}, close date: {self.closes_at}, current version pk: {self.post.version_current_id} self pk: {self.pk} status: {self.status}"
                 )
 
             return factors
@@ -0,0 +1,19 @@
+from django.db import models
+from django.utils import timezone
+
+
+class SearchIndexEvent(models.Model):
+    """
+    Outbox of the Algolia updates. Written in the same transaction as the rows it's about and
+    drained by the `push_search_index_events` task, so a slow or failing Algolia call neither
+    blocks the request nor loses the update.
+    """
+
+    model = models.CharField(max_length=255)  # label of the indexed model, eg eawork.Company
+    object_id = models.CharField(max_length=255)  # algolia objectID, the post pk for jobs
+    attempts = models.PositiveIntegerField(default=0)
+    retry_at = models.DateTimeField(default=timezone.now, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.model} #{self.object_id}"
@@ -47,19 +47,11 @@ class JobPostTag(models.Model):
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     link = models.TextField(blank=True)
-    
+    # posts whose current version has the tag, once per field. See eawork.services.tags
+    job_count = models.PositiveIntegerField(default=0, editable=False)
 
     def get_types_formatted(self) -> list[str]:
         return [type_instance.type.value for type_instance in self.types.all()]
 
-    def count(self) -> int:
-        from eawork.models.job_post import JobPost
-
-        count = 0
-        for enum_member in JobPostTagTypeEnum:
-            lookup_name = f"version_current__tags_{enum_member.value}__in"
-            count += JobPost.objects.filter(**{lookup_name: [self.pk]}).count()
-        return count
-
     def __str__(self) -> str:
         return self.name
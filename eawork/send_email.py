@@ -1,8 +1,21 @@
+from urllib.parse import urljoin
+
 import html2text
+import requests
+from anymail.backends.postmark import EmailBackend as PostmarkEmailBackend
 from django.conf import settings
+from django.core.mail import EmailMessage
 from django.core.mail import EmailMultiAlternatives
+from django.core.mail import get_connection
 from django.template.loader import get_template
 
+from eawork.services.streaming import batched
+
+
+# the anymail recipient statuses of a message that wasn't sent
+ANYMAIL_STATUSES_FAILED = {"failed", "invalid", "rejected"}
+EMAIL_BATCH_SIZE = 500  # the max of Postmark's /email/batch
+
 
 def send_email(
     subject: str,
@@ -12,6 +25,27 @@ def send_email(
     template_context: dict = None,
     email_from: str = settings.DEFAULT_FROM_EMAIL,
 ):
+    msg = build_email(
+        subject=subject,
+        email_to=email_to,
+        template_name=template_name,
+        content_html=content_html,
+        template_context=template_context,
+        email_from=email_from,
+    )
+    num_success = msg.send(fail_silently=True)
+    return bool(num_success)
+
+
+def build_email(
+    subject: str,
+    email_to: list[str],
+    template_name: str = None,
+    content_html: str = None,
+    template_context: dict = None,
+    email_from: str = settings.DEFAULT_FROM_EMAIL,
+    content_txt: str = None,
+) -> EmailMultiAlternatives:
     if template_name:
         template_html = get_template(template_name)
         content_html = template_html.render(
@@ -25,7 +59,7 @@ def send_email(
         )
         context_txt = html2text.html2text(content_html)
     elif content_html:
-        context_txt = html2text.html2text(content_html)
+        context_txt = content_txt or html2text.html2text(content_html)
     else:
         raise ValueError("args not provided")
 
@@ -39,5 +73,55 @@ def send_email(
         ],
     )
     msg.attach_alternative(content_html, "text/html")
-    num_success = msg.send(fail_silently=True)
-    return bool(num_success)
+    return msg
+
+
+def send_emails(messages: list[EmailMessage]) -> list[bool]:
+    """
+    Sends the messages over a single connection of EMAIL_BACKEND and returns whether each of
+    them was sent. With Postmark they are posted to its `/email/batch` endpoint, EMAIL_BATCH_SIZE
+    at a time, with the other backends one by one, eg over one SMTP session.
+    """
+    connection = get_connection(fail_silently=True)
+    connection.open()
+    try:
+        if isinstance(connection, PostmarkEmailBackend):
+            return [
+                is_sent
+                for batch in batched(messages, EMAIL_BATCH_SIZE)
+                for is_sent in _send_postmark_batch(connection, batch)
+            ]
+        return [_is_sent(msg, connection.send_messages([msg]) == 1) for msg in messages]
+    finally:
+        connection.close()
+
+
+def _send_postmark_batch(
+    connection: PostmarkEmailBackend, messages: list[EmailMessage]
+) -> list[bool]:
+    # the payloads anymail would post to `/email` one by one
+    payloads = [
+        connection.build_message_payload(msg, connection.send_defaults) for msg in messages
+    ]
+    params = payloads[0].get_request_params(connection.api_url)
+    params["url"] = urljoin(connection.api_url, "email/batch")
+    params["data"] = payloads[0].serialize_json([payload.data for payload in payloads])
+    try:
+        response = connection.session.request(**params, timeout=connection.timeout)
+        response.raise_for_status()
+        results = response.json()
+    except (requests.RequestException, ValueError) as err:
+        print(f"postmark batch of {len(messages)} emails failed: {err}")
+        return [False] * len(messages)
+    # in the order of the messages
+    is_sent = [result.get("ErrorCode") == 0 for result in results]
+    return is_sent + [False] * (len(messages) - len(is_sent))
+
+
+def _is_sent(msg: EmailMessage, is_counted_sent: bool) -> bool:
+    anymail_status = getattr(msg, "anymail_status", None)
+    if anymail_status is not None:
+        statuses = anymail_status.status
+        return bool(statuses) and not statuses <= ANYMAIL_STATUSES_FAILED
+    # the other backends only return the number of messages sent
+    return is_counted_sent
@@ -1,11 +1,19 @@
-from typing import TypedDict, List, Dict
+from typing import TypedDict, List, Dict, Iterator
 from typing import TypedDict
-from pyairtable import Table
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pyairtable import Table, retry_strategy
 from django.conf import settings
 from urllib.parse import urlencode, quote_plus
+from datetime import datetime, timezone
 import time
 import re
+from eawork.services.airtable_utils import recorded
+from eawork.services.airtable_utils import synthetic
+from eawork.services.airtable_utils.rate_limiter import RateLimiter
 from eawork.services.airtable_utils.title_to_slug import title_to_slug
+from eawork.services.streaming import batched
+from eawork.services.streaming import prefetch
 
 class Datum(TypedDict):
   link: str # can be blank
@@ -19,23 +27,47 @@ class DropdownData(TypedDict):
     location_filters: List[Datum]
     top_org_problem_areas: List[Datum]
 
-def import_from_airtable():
-    print("import airtable")
+VACANCIES_LIVE_FORMULA = "AND( {!Publication (is it live?)} = '!yes', IS_AFTER({!Date it closes}, DATEADD(TODAY(),-1,'days')), IS_BEFORE({!Date published}, NOW()) )"
 
-    # get related records that we'll use in vacancies, orgs, and rationales
-    dropdown = get_dropdown_data()
-    locations = get_locations_data()
 
-    raw_vacancies = get_raw_vacancy_data()
-    vacancies = transform_vacancies_data(raw_vacancies, dropdown["problem_areas"] | dropdown["problem_areas_filters"], locations) # `|` does dictionary merge
+def import_from_airtable(modified_since: datetime = None):
+    """
+    With `modified_since` only the vacancies and organisations modified (or published) after it
+    are fetched in full, plus the IDs of all live vacancies, so the import can still drop the
+    removed ones. Dropdowns and locations are small and always fetched in full.
+    """
+    print("import airtable")
 
-    raw_organisations = get_raw_organisation_data()
-    organisations = transform_organisations_data(
-        raw_organisations, 
-        dropdown["top_org_problem_areas"], 
-        dropdown["problem_areas_tags"] | dropdown["problem_areas"] | dropdown["rationales"] | dropdown["top_org_problem_areas"], # `|` does dictionary merge
-        locations, 
-        dropdown["location_filters"])
+    # get related records that we'll use in vacancies, orgs, and rationales
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        dropdown_future = executor.submit(get_dropdown_data)
+        locations_future = executor.submit(get_locations_data)
+        if modified_since:
+            vacancy_ids_future = executor.submit(get_vacancy_ids)
+
+        dropdown = dropdown_future.result()
+        locations = locations_future.result()
+
+    # The vacancies and orgs are streams of transformed records, fetched page by page in the
+    # background while the import writes the previous pages, so memory stays flat regardless of
+    # the table size. Both streams start fetching right away, so the vacancies are fetched while
+    # the companies are written.
+    vacancies = prefetch(
+        iter_vacancies(
+            modified_since,
+            dropdown["problem_areas"] | dropdown["problem_areas_filters"], # `|` does dictionary merge
+            parse_locations(locations),
+        )
+    )
+    organisations = prefetch(
+        iter_organisations(
+            modified_since,
+            dropdown["top_org_problem_areas"],
+            dropdown["problem_areas_tags"] | dropdown["problem_areas"] | dropdown["rationales"] | dropdown["top_org_problem_areas"], # `|` does dictionary merge
+            locations,
+            dropdown["location_filters"],
+        )
+    )
 
     res = {
         "meta": {"retrieved_at": round(time.time() * 1000)},
@@ -46,6 +78,8 @@ def import_from_airtable():
             "problem_area_tags": dropdown["rationales"] | dropdown["problem_areas"] | dropdown["problem_areas_filters"]
         },
     }
+    if modified_since:
+        res["data"]["vacancy_ids"] = vacancy_ids_future.result()
 
     # with open("output.txt", 'w') as writer:
     #     writer.write(json.dumps(res, indent=4))
@@ -53,6 +87,21 @@ def import_from_airtable():
     return res
 
 
+def iter_vacancies(modified_since: datetime, problem_area_id_to_name_map: Dict, locations: Dict[str, "ParsedLocation"]):
+    for page in iter_airtable_pages("!Vacancies", get_vacancy_params(modified_since)):
+        yield from transform_vacancies_data(page, problem_area_id_to_name_map, locations)
+
+
+# yields (name, org) pairs, like the items of transform_organisations_data
+def iter_organisations(
+    modified_since: datetime, top_orgs_problem_areas: Dict, all_potential_tags: Dict, location_id_to_name_map: Dict, region_id_to_name_map: Dict
+):
+    for page in iter_airtable_pages("!Orgs", get_organisation_params(modified_since)):
+        yield from transform_organisations_data(
+            page, top_orgs_problem_areas, all_potential_tags, location_id_to_name_map, region_id_to_name_map
+        ).items()
+
+
 def get_dropdown_data() -> DropdownData:
   raw_data = get_raw_dropdown_data()
   
@@ -113,7 +162,59 @@ def get_raw_dropdown_data():
     return dropdown_data
 
 
+@dataclass(frozen=True)
+class ParsedLocation:
+    city: str
+    country: str
+    city_and_country: str  # as displayed, e.g. "London, UK" or "Remote, Global"
+
+
+def parse_locations(location_id_to_name_map: Dict[str, str]) -> Dict[str, ParsedLocation]:
+    """
+    Parses the "City.Country" location names once per sync, so the vacancy transform only has to
+    look them up by ID.
+    """
+    locations = {}
+    for id, location_name in location_id_to_name_map.items():
+        location_parts = location_name.split(".")
+        if len(location_parts) < 2:
+            continue  # not usable, the vacancies that reference it fail on the lookup
+        locations[id] = ParsedLocation(
+            city=location_parts[0],
+            country=location_parts[1],
+            city_and_country=_get_city_and_country(location_parts[0], location_parts[1]),
+        )
+    return locations
+
+
+def _get_city_and_country(location_city: str, location_country: str) -> str:
+    city_lowercase = location_city.lower()
+    country_lowercase = location_country.lower()
+
+    if city_lowercase == 'various countries' and country_lowercase == 'various countries':
+        return location_city
+    elif city_lowercase != 'remote':
+        if country_lowercase != 'usa':
+            return location_city + ', ' + location_country
+        return location_city
+    elif city_lowercase == 'remote' and country_lowercase != 'remote':
+        return location_city + ', ' + location_country
+    else:
+        return location_country
+
+
 def get_locations_data():
+    locations = get_raw_locations_data()
+
+    if (type(locations) != list): 
+      return {}
+    location_id_to_name_map = {}
+    for location in locations:
+      location_id_to_name_map[location['id']] = location['fields']['!Location']
+
+    return location_id_to_name_map
+
+def get_raw_locations_data():
     table_name = '!Locations'
     params: Param = {
       'fields':['!Location',
@@ -122,18 +223,13 @@ def get_locations_data():
       'pageSize': 100
     }
 
-    locations = get_airtable_data(table_name, params)
+    return get_airtable_data(table_name, params)
 
-    if (type(locations) != list): 
-      return {}
-    location_id_to_name_map = {}
-    for location in locations:
-      location_id_to_name_map[location['id']] = location['fields']['!Location']
+def get_raw_vacancy_data(modified_since: datetime = None):
+    return get_airtable_data("!Vacancies", get_vacancy_params(modified_since))
 
-    return location_id_to_name_map
 
-def get_raw_vacancy_data():
-    table_name = "!Vacancies"
+def get_vacancy_params(modified_since: datetime = None) -> "Param":
 
     # note that airtable has a weird thing where 21 seems to be a hard limit for number of fields requested.
     fields = [
@@ -158,7 +254,11 @@ def get_raw_vacancy_data():
         "!Evergreen"
     ]
 
-    filter = "AND( {!Publication (is it live?)} = '!yes', IS_AFTER({!Date it closes}, DATEADD(TODAY(),-1,'days')), IS_BEFORE({!Date published}, NOW()) )"
+    filter = VACANCIES_LIVE_FORMULA
+    if modified_since:
+        # a vacancy also goes live without being modified when its publication date passes
+        since = _to_formula_datetime(modified_since)
+        filter = f"AND( {filter}, OR( IS_AFTER(LAST_MODIFIED_TIME(), {since}), IS_AFTER({{!Date published}}, {since}) ) )"
 
     params: Param = {
         "fields": fields,
@@ -169,48 +269,55 @@ def get_raw_vacancy_data():
         ],
         "max_records": 10000,
     }
+    return params
 
-    vacancies = get_airtable_data(table_name, params)
 
-    return vacancies
+# cheap listing of all live vacancies, to detect the removed ones during an incremental sync
+def get_vacancy_ids() -> List[str]:
+    params: Param = {
+        "fields": ["!Title"],
+        "filterByFormula": VACANCIES_LIVE_FORMULA,
+        "max_records": 10000,
+    }
+    return [record["id"] for record in get_airtable_data("!Vacancies", params)]
 
 
-def get_raw_organisation_data():
-    table_name = "!Orgs"
-    fields = (
-        [
-            "!Org",
-            "!Home page",
-            "!Vacancies page",
-            "!Description",
-            "!Logo",
-            "!Text_hover",
-            "!Problem area (orgs)",
-            "!Locations (orgs)",
-            "!Internal links",
-            "!External links",
-            "!Org size",
-            "!Founded year",
-            "!Glassdoor link",
-            "!Social media links",
-            "!Region (orgs)",
-            "!EA Forum link",
-            "!Recommended org (star)",
-            "!Single line description",
-            "!Tags (orgs)",
-            "!Additional commentary",
-            "!HQ"
-        ],
-    )
+def get_raw_organisation_data(modified_since: datetime = None):
+    return get_airtable_data("!Orgs", get_organisation_params(modified_since))
 
-    params = {"fields": fields, "max_records": 10000}
 
-    organisations = get_airtable_data(table_name, params)
+def get_organisation_params(modified_since: datetime = None) -> "Param":
+    fields = [
+        "!Org",
+        "!Home page",
+        "!Vacancies page",
+        "!Description",
+        "!Logo",
+        "!Text_hover",
+        "!Problem area (orgs)",
+        "!Locations (orgs)",
+        "!Internal links",
+        "!External links",
+        "!Org size",
+        "!Founded year",
+        "!Glassdoor link",
+        "!Social media links",
+        "!Region (orgs)",
+        "!EA Forum link",
+        "!Recommended org (star)",
+        "!Single line description",
+        "!Tags (orgs)",
+        "!Additional commentary",
+        "!HQ"
+    ]
 
-    return organisations
+    params = {"fields": fields, "max_records": 10000}
+    if modified_since:
+        params["filterByFormula"] = f"IS_AFTER(LAST_MODIFIED_TIME(), {_to_formula_datetime(modified_since)})"
+    return params
 
 
-def transform_vacancies_data(vacancies: List[Dict], problem_area_id_to_name_map: Dict, location_id_to_name_map: Dict):
+def transform_vacancies_data(vacancies: List[Dict], problem_area_id_to_name_map: Dict, locations: Dict[str, "ParsedLocation"]):
     transformed_vacancies = []
      # Go through transforming individual vacancies.
     for vacancy_container in vacancies:
@@ -281,57 +388,31 @@ def transform_vacancies_data(vacancies: List[Dict], problem_area_id_to_name_map:
       # Remove the original fields
       vacancy.pop(problem_area_key, None)
 
-      # Locations!
+      # Locations! Their names are parsed once per sync, see parse_locations
       cities_and_countries = []
       countries = []
 
-      # Transform location fields...
       location_ids = vacancy['Location']
       for idx, id in enumerate(location_ids):
-        # Get location name
-        location_name: str = location_id_to_name_map[id]
-
-        # Split and transform
-        location_parts = location_name.split(".")
-        location_city = location_parts[0]
-        location_country = location_parts[1]
+        location = locations[id]
 
         # Must always include these fields (???)
         vacancy['Additional Location: City'] = ''
         vacancy['Additional Location: Country'] = ''
 
         if idx == 0:
-          vacancy['Location: City'] = location_city
-          vacancy['Location: Country'] = location_country
+          vacancy['Location: City'] = location.city
+          vacancy['Location: Country'] = location.country
         elif idx == 1:
-          vacancy['Additional Location: City'] = location_city
-          vacancy['Additional Location: Country'] = location_country
+          vacancy['Additional Location: City'] = location.city
+          vacancy['Additional Location: Country'] = location.country
         # else:
           # We do not support more than 2 locations per vacancy at the moment.
-        
 
-        city_and_country = ''
-        city_lowercase = location_city.lower()
-        country_lowercase = location_country.lower()
+        cities_and_countries.append(location.city_and_country)
 
-        if city_lowercase == 'various countries' and country_lowercase == 'various countries':
-          city_and_country = location_city
-        elif city_lowercase != 'remote':
-          city_and_country = location_city
-
-          if country_lowercase != 'usa':
-            city_and_country = city_and_country + ', ' + location_country
-          
-        elif city_lowercase == 'remote' and country_lowercase != 'remote':
-          city_and_country = location_city + ', ' + location_country
-        else:
-          city_and_country = location_country
-        
-
-        cities_and_countries.append(city_and_country)
-
-        if location_country:
-          countries.append(location_country)
+        if location.country:
+          countries.append(location.country)
         
       vacancy['Locations'] = {
         'citiesAndCountries': cities_and_countries,
@@ -497,16 +578,78 @@ class Param(TypedDict):
   max_records: int
   sort: List[str]
 
+# Airtable allows 5 requests per second per base, and answers 429 for 30 seconds after that
+AIRTABLE_REQUESTS_PER_SECOND = 5
+AIRTABLE_PAGE_SIZE = 100
+AIRTABLE_RETRY_STRATEGY = retry_strategy(backoff_factor=2, total=5)
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+
+
+class RateLimitedTable(Table):
+    # the limiter spaces the requests, including the ones of the other tables of the base
+    API_LIMIT = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, retry_strategy=AIRTABLE_RETRY_STRATEGY, **kwargs)
+        self.rate_limiter = _rate_limiters.setdefault(
+            self.base_id, RateLimiter(AIRTABLE_REQUESTS_PER_SECOND)
+        )
+
+    def _request(self, *args, **kwargs):
+        self.rate_limiter.wait()
+        return super()._request(*args, **kwargs)
+
+
 def get_airtable_data(table_name: str, params: Param) -> List[dict]:
-    table = Table(settings.AIRTABLE["API_KEY"], settings.AIRTABLE["BASE_ID"], table_name)
-    data = table.all(
-        fields=params["fields"],
-        formula=params.get("filterByFormula", ""),
-        sort=params.get("sort", []),
-        max_records=params.get("max_records", 1000),
-    )
-    return data
-   
+    return [record for page in iter_airtable_pages(table_name, params) for record in page]
+
+
+def iter_airtable_pages(table_name: str, params: Param) -> Iterator[List[dict]]:
+    """
+    Fetches from the source set by `AIRTABLE["SOURCE"]`:
+    - "api": the airtable base
+    - "recorded": the JSON snapshots in `AIRTABLE["FIXTURES_DIR"]`
+    - "synthetic": generated records, `AIRTABLE["SYNTHETIC_VACANCIES"]` vacancies and
+      `AIRTABLE["SYNTHETIC_ORGS"]` orgs
+
+    The offline sources ignore the formula, the sort and `max_records`, so they behave like a
+    base where every record is live and was just modified, and the synthetic one can be generated
+    at any size.
+    """
+    match settings.AIRTABLE["SOURCE"]:
+        case "api":
+            table = RateLimitedTable(settings.AIRTABLE["API_KEY"], settings.AIRTABLE["BASE_ID"], table_name)
+            yield from table.iterate(
+                fields=params["fields"],
+                formula=params.get("filterByFormula", ""),
+                sort=params.get("sort", []),
+                max_records=params.get("max_records", 1000),
+            )
+            return
+        case "recorded":
+            records = recorded.load_table(settings.AIRTABLE["FIXTURES_DIR"], table_name)
+        case "synthetic":
+            records = synthetic.generate_table(
+                table_name,
+                vacancies=settings.AIRTABLE["SYNTHETIC_VACANCIES"],
+                orgs=settings.AIRTABLE["SYNTHETIC_ORGS"],
+                seed=settings.AIRTABLE["SYNTHETIC_SEED"],
+            )
+        case source:
+            raise ValueError(f"Unknown airtable source {source}")
+
+    for page in batched(records, AIRTABLE_PAGE_SIZE):
+        for record in page:
+            record["fields"] = {
+                name: value for name, value in record["fields"].items() if name in params["fields"]
+            }
+        yield page
+
+def _to_formula_datetime(value: datetime) -> str:
+    return f"DATETIME_PARSE('{value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')}')"
+
+
 def append_url_params(url: str):
     # Should not add tracking params if domain is 80000hours.org, or these other sites that get broken by tracking params
     domains_to_exclude = [
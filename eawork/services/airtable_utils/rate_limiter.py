@@ -0,0 +1,22 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Spaces out calls across all threads sharing the instance, e.g. Airtable allows 5 requests
+    per second per base.
+    """
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            wait_for = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
@@ -0,0 +1,24 @@
+import json
+from pathlib import Path
+from typing import List
+
+
+# Snapshots of airtable tables, one JSON file with the list of records per table, e.g. as
+# written by the `record_airtable_fixtures` command.
+
+
+def get_fixture_path(fixtures_dir: str, table_name: str) -> Path:
+    # "!Vacancies" -> vacancies.json
+    return Path(fixtures_dir) / f"{table_name.strip('!').lower()}.json"
+
+
+def load_table(fixtures_dir: str, table_name: str) -> List[dict]:
+    with open(get_fixture_path(fixtures_dir, table_name)) as file:
+        return json.load(file)
+
+
+def save_table(fixtures_dir: str, table_name: str, records: List[dict]):
+    path = get_fixture_path(fixtures_dir, table_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(records, file, indent=1)
@@ -0,0 +1,216 @@
+import random
+from typing import Dict
+from typing import Iterator
+from typing import List
+
+
+# A stand-in for the airtable base: generates records shaped like the ones the API returns for
+# the tables we fetch, so that the import can be benchmarked and tested without network access.
+# The output only depends on the arguments, and each table can be generated on its own. The
+# records are generated lazily, so big tables don't have to fit in memory.
+
+PROBLEM_AREAS = [
+    "AI safety & policy",
+    "Biosecurity & pandemic preparedness",
+    "Global health & poverty",
+    "Building effective altruism",
+    "Animal welfare",
+    "Global priorities research",
+    "Institutional decision-making",
+    "Nuclear security",
+    "Climate change",
+    "Forecasting",
+]
+RATIONALES = ["Career capital", "Direct impact", "Top recommended organisation"]
+ROLE_TYPES = [
+    "Research",
+    "Operations",
+    "Policy",
+    "Software engineering",
+    "Management",
+    "Communications",
+    "Grantmaking",
+    "Advocacy",
+    "Internship",
+    "Fellowship",
+]
+EXPERIENCE_LEVELS = [
+    "Entry-level",
+    "Junior (1-4 years experience)",
+    "Mid (5-9 years experience)",
+    "Senior (10+ years experience)",
+]
+DEGREES = ["Undergraduate degree or less", "Master's degree", "PhD"]
+LOCATIONS = [
+    "Remote.Global",
+    "London.UK",
+    "San Francisco Bay Area.USA",
+    "Washington, DC.USA",
+    "Oxford.UK",
+    "Boston.USA",
+    "Remote.USA",
+    "New York.USA",
+    "Berlin.Germany",
+    "Geneva.Switzerland",
+    "Cambridge.UK",
+    "Remote.UK",
+    "Nairobi.Kenya",
+    "Delhi.India",
+    "Various countries.Various countries",
+    "Remote.Remote",
+]
+REGIONS = ["USA", "UK", "Europe", "Global", "Africa", "Asia", "Oceania", "Latin America"]
+SALARIES = ["Not Found", "", "£35,000 - £45,000", "$80,000 - $120,000", "€50,000"]
+
+DROPDOWN_CATEGORIES: Dict[str, List[str]] = {
+    "!Problem area": PROBLEM_AREAS,
+    "!Problem area (tags)": [f"{area} (tag)" for area in PROBLEM_AREAS],
+    "!Problem areas (filters)": PROBLEM_AREAS,
+    "!Rationale": RATIONALES,
+    "!Location filters (orgs tab)": REGIONS,
+    "!Top orgs (problem area)": PROBLEM_AREAS[:5],
+}
+
+
+def generate_table(table_name: str, vacancies: int, orgs: int, seed: int = 0) -> Iterator[dict]:
+    match table_name:
+        case "!Dropdowns":
+            return generate_dropdowns()
+        case "!Locations":
+            return generate_locations()
+        case "!Vacancies":
+            return generate_vacancies(vacancies, orgs, seed)
+        case "!Orgs":
+            return generate_orgs(orgs, seed)
+    raise ValueError(f"No synthetic data for the table {table_name}")
+
+
+def generate_dropdowns() -> Iterator[dict]:
+    return (
+        {
+            "id": _dropdown_id(category, index),
+            "createdTime": "2022-01-01T00:00:00.000Z",
+            "fields": {
+                "!Name for front end": name,
+                "!Link for tag": f"https://80000hours.org/problem-profiles/{index}/",
+                "!Category": category,
+            },
+        }
+        for category, names in DROPDOWN_CATEGORIES.items()
+        for index, name in enumerate(names)
+    )
+
+
+def generate_locations() -> Iterator[dict]:
+    return (
+        {
+            "id": f"recLocation{index:05d}",
+            "createdTime": "2022-01-01T00:00:00.000Z",
+            "fields": {"!Location": name},
+        }
+        for index, name in enumerate(LOCATIONS)
+    )
+
+
+def generate_vacancies(count: int, orgs: int, seed: int = 0) -> Iterator[dict]:
+    rnd = random.Random(f"vacancies-{seed}")
+    # big orgs post most of the vacancies
+    org_weights = _cumulative_weights(orgs)
+    for index in range(count):
+        role_types = _sample(rnd, ROLE_TYPES, rnd.randint(1, 2))
+        fields = {
+            "!Title": f"{role_types[0]} {rnd.choice(['Associate', 'Manager', 'Lead', 'Fellow'])} {index}",
+            "!Org": f"Organisation {rnd.choices(range(orgs), cum_weights=org_weights)[0]}",
+            "!Date it closes": rnd.choice(
+                ["2050-01-01", "2040-01-31", "2041-06-30", "2042-12-31"]
+            ),
+            "!Date published": f"2022-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T09:00:00.000Z",
+            "!Problem area (filters)": [
+                _dropdown_id("!Problem areas (filters)", PROBLEM_AREAS.index(area))
+                for area in _sample(rnd, PROBLEM_AREAS, rnd.randint(1, 3))
+            ],
+            "!Description": f"Vacancy {index} description.\n\n* responsibility\n* another one",
+            "!Vacancy page": f"https://organisation.example.org/jobs/{index}",
+            "!Role type": role_types,
+            "!Required degree": _sample(rnd, DEGREES, 1)[0],
+            "!Location": [
+                f"recLocation{LOCATIONS.index(location):05d}"
+                for location in _sample(rnd, LOCATIONS, rnd.choice([1, 1, 1, 2]))
+            ],
+            "!is_recommended_org": rnd.random() < 0.3,
+            "!MinimumExperienceLevel": _sample(rnd, EXPERIENCE_LEVELS, 1),
+            "!Salary (display)": _sample(rnd, SALARIES, 1)[0],
+            "!Region": _sample(rnd, REGIONS, rnd.randint(1, 2)),
+            "!Problem area (tags)": [f"{area} (tag)" for area in _sample(rnd, PROBLEM_AREAS, 2)],
+            "!Visa sponsorship": rnd.choice(["Yes", "No", ""]),
+            "!Evergreen": rnd.random() < 0.1,
+        }
+        if rnd.random() < 0.05:
+            fields["!Featured"] = ["Yes"]
+        yield {
+            "id": f"recVacancy{index:07d}",
+            "createdTime": "2022-01-01T00:00:00.000Z",
+            "fields": fields,
+        }
+
+
+def generate_orgs(count: int, seed: int = 0) -> Iterator[dict]:
+    rnd = random.Random(f"orgs-{seed}")
+    tag_ids = [
+        _dropdown_id(category, index)
+        for category in ["!Problem area (tags)", "!Problem area", "!Rationale"]
+        for index in range(len(DROPDOWN_CATEGORIES[category]))
+    ]
+    for index in range(count):
+        fields = {
+            "!Org": f"Organisation {index}",
+            "!Home page": f"organisation-{index}.example.org",
+            "!Vacancies page": f"https://organisation-{index}.example.org/careers",
+            "!Description": f"Organisation {index} works on *important* problems.",
+            "!Logo": f"https://80000hours.org/wp-content/uploads/logo-{index}.png",
+            "!Text_hover": f"About organisation {index}",
+            "!Problem area (orgs)": [_dropdown_id("!Top orgs (problem area)", rnd.randrange(5))],
+            "!Locations (orgs)": [
+                f"recLocation{LOCATIONS.index(location):05d}"
+                for location in _sample(rnd, LOCATIONS, rnd.randint(1, 3))
+            ],
+            "!Org size": rnd.choice(["1-10", "11-50", "51-200", "200+"]),
+            "!Founded year": str(rnd.randint(1990, 2022)),
+            "!Region (orgs)": [
+                _dropdown_id("!Location filters (orgs tab)", REGIONS.index(region))
+                for region in _sample(rnd, REGIONS, rnd.randint(1, 2))
+            ],
+            "!Recommended org (star)": rnd.random() < 0.2,
+            "!Single line description": f"Organisation {index} in one line",
+            "!Tags (orgs)": rnd.sample(tag_ids, rnd.randint(0, 3)),
+            "!HQ": [f"recLocation{LOCATIONS.index(_sample(rnd, LOCATIONS, 1)[0]):05d}"],
+        }
+        yield {
+            "id": f"recOrganisation{index:05d}",
+            "createdTime": "2022-01-01T00:00:00.000Z",
+            "fields": fields,
+        }
+
+
+def _dropdown_id(category: str, index: int) -> str:
+    return f"recDropdown{list(DROPDOWN_CATEGORIES).index(category)}{index:04d}"
+
+
+def _cumulative_weights(count: int) -> List[float]:
+    # Zipf-like, the first values are the most common ones, like on the real board
+    weights = []
+    total = 0.0
+    for rank in range(count):
+        total += 1 / (rank + 1)
+        weights.append(total)
+    return weights
+
+
+def _sample(rnd: random.Random, population: List[str], count: int) -> List[str]:
+    weights = _cumulative_weights(len(population))
+    sample = []
+    while len(sample) < count:
+        value = rnd.choices(population, cum_weights=weights)[0]
+        if value not in sample:
+            sample.append(value)
+    return sample
@@ -0,0 +1,27 @@
+from django.db import connection
+from django.db.models import Model
+
+
+# rows per bulk_create / bulk_update query
+BULK_BATCH_SIZE = 500
+
+
+def bulk_create_with_pks(
+    model: type[Model], objs: list[Model], key_field: str, batch_size: int
+) -> list[Model]:
+    """
+    `bulk_create` that sets the pks of `objs` on every backend. Postgres returns them from the
+    insert, the others (eg SQLite in the docker builder) get them read back by `key_field`,
+    which must be unique among `objs`. Older rows with the same key lose to the new ones.
+    """
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    if objs and not connection.features.can_return_rows_from_bulk_insert:
+        keys = [getattr(obj, key_field) for obj in objs]
+        pks = dict(
+            model.objects.filter(**{f"{key_field}__in": keys})
+            .order_by("pk")
+            .values_list(key_field, "pk")
+        )
+        for obj in objs:
+            obj.pk = pks[getattr(obj, key_field)]
+    return objs
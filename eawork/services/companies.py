@@ -0,0 +1,86 @@
+from collections import defaultdict
+from typing import Iterable
+from typing import TypedDict
+
+from django.db.models import F
+from django.db.models import Prefetch
+
+from eawork.models import Company
+from eawork.models import JobPostTag
+from eawork.models import JobPostVersion
+from eawork.services.bulk import BULK_BATCH_SIZE
+from eawork.services.streaming import batched
+
+
+REFRESH_BATCH_SIZE = 1000
+
+
+class CompanyPostSummary(TypedDict):
+    pk: int
+    title: str
+    salary: str
+    visa_sponsorship: str
+    problem_areas: list[str]
+    experience_required: list[str]
+    closes_at: str | None  # isoformat, the closed ones are only dropped when the record is built
+
+
+class CompanyProjection(TypedDict):
+    posts: list[CompanyPostSummary]
+    locations: list[str]
+    problem_areas: list[str]
+    hq: str
+
+
+def refresh_company_projections(company_pks: Iterable[int]):
+    """
+    Recomputes `Company.search_projection`, the data of the Algolia company records that comes
+    from other tables, with 7 queries per batch of companies instead of a few per company job.
+    """
+    # only the tag names are loaded, so that the 0042 migration can run it before the later
+    # tag columns exist
+    tag_names = JobPostTag.objects.only("name")
+    for batch in batched(company_pks, REFRESH_BATCH_SIZE):
+        companies = list(
+            Company.objects.filter(pk__in=batch)
+            .annotate(hq_name=F("headquarters__name"))
+            .prefetch_related(
+                Prefetch("tags_locations", queryset=tag_names),
+                Prefetch("tags_areas", queryset=tag_names),
+            )
+        )
+        versions_current = (
+            JobPostVersion.objects.filter(
+                post__company__in=companies, post__version_current=F("pk")
+            )
+            .annotate(company_pk=F("post__company_id"))
+            .prefetch_related(
+                Prefetch("tags_area", queryset=tag_names),
+                Prefetch("tags_exp_required", queryset=tag_names),
+            )
+            .order_by("post_id")
+        )
+        posts_by_company: dict[int, list[CompanyPostSummary]] = defaultdict(list)
+        for version in versions_current:
+            posts_by_company[version.company_pk].append(
+                CompanyPostSummary(
+                    pk=version.pk,
+                    title=version.title,
+                    salary=version.salary,
+                    visa_sponsorship=version.visa_sponsorship,
+                    problem_areas=version.get_tags_area_formatted(),
+                    experience_required=version.get_tags_exp_required_formatted(),
+                    closes_at=version.closes_at.isoformat() if version.closes_at else None,
+                )
+            )
+
+        for company in companies:
+            company.search_projection = CompanyProjection(
+                posts=posts_by_company[company.pk],
+                locations=[tag.name.replace(".", ", ") for tag in company.tags_locations.all()],
+                problem_areas=[tag.name for tag in company.tags_areas.all()],
+                hq=company.hq_name or "",
+            )
+        Company.objects.bulk_update(
+            companies, fields=["search_projection"], batch_size=BULK_BATCH_SIZE
+        )
@@ -1,4 +1,10 @@
-from typing import Literal, TypedDict, Mapping
+import hashlib
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, Literal, TypedDict, Mapping
 
 import pytz
 import requests
@@ -6,153 +12,396 @@ import re
 import markdown
 from dateutil.parser import parse
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from eawork.models import Company
 from eawork.models import JobPost
 from eawork.models import JobPostTag
-from eawork.models import JobPostTagType
 from eawork.models import JobPostTagTypeEnum
 from eawork.models import JobPostVersion
-from eawork.models import PostJobTagStatus
+from eawork.models import JOB_POST_VERSION_TAG_FIELDS
 from eawork.models import PostStatus
 from eawork.models.job_alert import JobAlert
+from eawork.services.bulk import BULK_BATCH_SIZE
+from eawork.services.bulk import bulk_create_with_pks
 from eawork.services.email_log import Code, Task, email_log
+from eawork.services.search_index import IndexChanges
+from eawork.services.search_index import enqueue_index_changes
+from eawork.services.streaming import batched
+from eawork.services.tags import TagNames
+from eawork.services.tags import TagRegistry
+from eawork.services.tags import refresh_tag_counts
+from eawork.services.tags import sync_tags
 from sentry_sdk import capture_exception, capture_message
 
 
+# vacancies and companies are written in batches of this many, so memory doesn't grow with the
+# size of the airtable tables
+IMPORT_BATCH_SIZE = 1000
+
+JOB_POST_VERSION_IMPORTED_FIELDS = [
+    "title",
+    "description_short",
+    "url_external",
+    "salary",
+    "visa_sponsorship",
+    "evergreen",
+    "closes_at",
+    "posted_at",
+    "experience_min",
+    "experience_avg",
+]
+
+
+COMPANY_TAG_FIELDS = ["tags_areas", "tags_locations"]
+
+
+COMPANY_IMPORTED_FIELDS = [
+    "name",
+    "description",
+    "description_short",
+    "text_hover",
+    "year_founded",
+    "org_size",
+    "is_top_recommended_org",
+    "additional_commentary",
+    "url",
+    "logo_url",
+    "career_page_url",
+    "glassdoor_url",
+    "forum_url",
+    "internal_links",
+    "external_links",
+    "social_media_links",
+]
+
+# "1. AI safety" -> "AI safety", account for API oddity for now.
+AREA_NUMBER_PATTERN = re.compile(r"\w+\. ")
+
+# bump it whenever the import logic changes, so that every record is rewritten once
+IMPORT_HASH_VERSION = 1
+
+
+@dataclass
+class ImportStats:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    skipped: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.created} created, {self.updated} updated, "
+            f"{self.unchanged} unchanged, {self.removed} removed, {self.skipped} skipped"
+        )
+
+
 class AirtableTag(TypedDict):
     name: str
     link: str
 
 
-def import_companies(data_raw: dict):
+def import_companies(data_raw: dict, registry: TagRegistry = None) -> ImportStats:
     print("import companies")
-    companies_dict: dict[str, dict] = data_raw["organisations"]
+    registry = registry or TagRegistry()
+    stats = ImportStats()
+    # a dict keyed by the ID, or a stream of (ID, company) pairs from import_from_airtable
+    companies_raw: Mapping[str, dict] | Iterable[tuple[str, dict]] = data_raw["organisations"]
+    if isinstance(companies_raw, Mapping):
+        companies_raw = companies_raw.items()
+    for batch in batched(companies_raw, IMPORT_BATCH_SIZE):
+        # the Algolia updates are recorded in the outbox together with the rows
+        with registry.atomic():
+            changes = IndexChanges()
+            # the last duplicate wins, like in a dict
+            _upsert_companies(dict(batch), registry, stats, changes)
+            enqueue_index_changes(changes)
+
+    print(f"companies: {stats}")
+    return stats
+
+
+def _upsert_companies(
+    companies_dict: dict[str, dict],
+    registry: TagRegistry,
+    stats: ImportStats,
+    changes: IndexChanges,
+):
+    companies_existing: dict[str, Company] = {
+        company.id_external_80_000_hours: company
+        for company in Company.objects.filter(id_external_80_000_hours__in=list(companies_dict))
+    }
+    companies_new: list[Company] = []
+    companies_updated: list[Company] = []
+    companies_tags: list[tuple[Company, TagNames]] = []
+    companies_hq: list[tuple[Company, str]] = []
     # bonus_data = _derive_some_company_data(data_raw)
     for company_id in companies_dict:
         company_raw: dict[
             Literal["name", "description", "homepage", "logo", "career_page", "headquarters"],
             str,
         ] = companies_dict[company_id]
-        if Company.objects.filter(id_external_80_000_hours=company_id).exists():
-            company = Company.objects.get(id_external_80_000_hours=company_id)
-            company.name = company_raw["name"]
-            company.description = markdown.markdown(company_raw["description"])
-            company.description_short = markdown.markdown(company_raw["single_line_description"])
-            company.text_hover = markdown.markdown(company_raw["text_hover"])
-            company.year_founded = company_raw["founded_year"]
-            company.org_size = company_raw["org_size"]
-            company.is_top_recommended_org = company_raw["recommended_org"]
-            company.additional_commentary = markdown.markdown(
-                company_raw["additional_commentary"]
-            )
+        content_hash = get_content_hash(company_raw)
 
-            company.url = company_raw["homepage"]
-            company.logo_url = company_raw["logo"]
-            company.career_page_url = company_raw["career_page"]
-            company.glassdoor_url = company_raw["glassdoor_link"]
-            company.forum_url = company_raw["forum_link"]
+        company = companies_existing.get(company_id)
+        if company and company.content_hash_80_000_hours == content_hash:
+            stats.unchanged += 1
+            continue
 
-            company.internal_links = markdown.markdown(company_raw["internal_links"])
-            company.external_links = markdown.markdown(company_raw["external_links"])
-            company.social_media_links = markdown.markdown(company_raw["social_media_links"])
+        if company:
+            companies_updated.append(company)
+        else:
+            company = Company(id_external_80_000_hours=company_id)
+            companies_new.append(company)
 
-            company.save()
-            _update_or_add_tags_orgs(company, company_raw)
-            add_headquarters(company, company_raw["headquarters"])
+        company.content_hash_80_000_hours = content_hash
+        _update_company(company, company_raw)
+        companies_tags.append((company, _update_or_add_tags_orgs(company_raw, registry)))
+        if add_headquarters(company_raw["headquarters"], registry):
+            companies_hq.append((company, company_raw["headquarters"]))
 
-        else:
-            comp = Company.objects.create(
-                name=company_raw["name"],
-                id_external_80_000_hours=company_raw["name"],
-                description=markdown.markdown(company_raw["description"]),
-                url=company_raw["homepage"],
-                logo_url=company_raw["logo"],
-                career_page_url=company_raw["career_page"],
-                is_top_recommended_org=company_raw["recommended_org"],
-                forum_url=company_raw["forum_link"],
-            )
+    changes.tags |= registry.flush()
 
-            _update_or_add_tags_orgs(comp, company_raw)
+    for company, hq_name in companies_hq:
+        company.headquarters = registry.get(hq_name)
 
+    bulk_create_with_pks(
+        Company, companies_new, "id_external_80_000_hours", batch_size=BULK_BATCH_SIZE
+    )
+    now = timezone.now()
+    for company in companies_updated:
+        company.updated_at = now
+    Company.objects.bulk_update(
+        companies_updated,
+        fields=COMPANY_IMPORTED_FIELDS
+        + ["headquarters", "content_hash_80_000_hours", "updated_at"],
+        batch_size=BULK_BATCH_SIZE,
+    )
 
-def import_jobs(data_raw: dict, limit: int = None):
+    changes.tags |= sync_tags(
+        Company,
+        COMPANY_TAG_FIELDS,
+        {company.pk: tag_names for company, tag_names in companies_tags},
+        registry,
+    )
+    changes.companies.update(company.pk for company in companies_new + companies_updated)
+
+    stats.created += len(companies_new)
+    stats.updated += len(companies_updated)
+
+
+# only sets the fields in memory, the caller is responsible for writing them
+def _update_company(company: Company, company_raw: dict):
+    company.name = company_raw["name"]
+    company.description = markdown.markdown(company_raw["description"])
+    company.description_short = markdown.markdown(company_raw["single_line_description"])
+    company.text_hover = markdown.markdown(company_raw["text_hover"])
+    company.year_founded = company_raw["founded_year"]
+    company.org_size = company_raw["org_size"]
+    company.is_top_recommended_org = company_raw["recommended_org"]
+    company.additional_commentary = markdown.markdown(company_raw["additional_commentary"])
+
+    company.url = company_raw["homepage"]
+    company.logo_url = company_raw["logo"]
+    company.career_page_url = company_raw["career_page"]
+    company.glassdoor_url = company_raw["glassdoor_link"]
+    company.forum_url = company_raw["forum_link"]
+
+    company.internal_links = markdown.markdown(company_raw["internal_links"])
+    company.external_links = markdown.markdown(company_raw["external_links"])
+    company.social_media_links = markdown.markdown(company_raw["social_media_links"])
+
+
+# returns None if the import failed
+def import_jobs(
+    data_raw: dict,
+    limit: int = None,
+    registry: TagRegistry = None,
+) -> ImportStats | None:
     print("import jobs")
+    stats = ImportStats()
+    # the location tag caches only live for one sync, not for the whole worker process
+    _get_city_tags.cache_clear()
+    _get_country_tags.cache_clear()
 
     try:
-        jobs_raw: list[dict] = _strip_all_json_strings(data_raw["vacancies"])
+        # a list, or a stream of vacancies from import_from_airtable that is written batch by batch
+        jobs_raw: Iterator[dict] = iter(data_raw["vacancies"])
+        registry = registry or TagRegistry()
+        changes = IndexChanges()
+        ids_seen: list[str] = []
+
+        with registry.atomic():
+            for batch in batched(islice(jobs_raw, limit or None), IMPORT_BATCH_SIZE):
+                batch = _strip_all_json_strings(batch)
+                ids_seen += [job_raw["id"] for job_raw in batch]
+                _upsert_jobs(batch, registry, stats, changes)
+            # the vacancies past the limit are only needed for their IDs
+            ids_seen += [job_raw["id"].strip() for job_raw in jobs_raw]
+
+            # an incremental sync only carries the modified vacancies, plus the IDs of all live ones
+            ids_live: list[str] = data_raw.get("vacancy_ids", ids_seen)
+            stats.removed = _cleanup_removed_jobs(ids_live, changes)
+            changes.tags |= refresh_tag_counts()
+            enqueue_index_changes(changes)
 
-        _cleanup_removed_jobs(jobs_raw)
+        count = JobPostVersion.objects.all().count()
+        email_log(Task.IMPORT, Code.SUCCESS, content=f"{count} jobs imported\nJobs: {stats}")
+    except Exception as err:
+        email_log(Task.IMPORT, Code.FAILURE, content=f"Error:\n{err}")
+        capture_exception(err)
+        return None
+    return stats
 
-        if limit:
-            jobs_raw = jobs_raw[:limit]
 
-        for job_raw in jobs_raw:
-            job_existing = JobPost.objects.filter(
-                id_external_80_000_hours=job_raw["id"],
-                version_current__isnull=False,
-            ).last()
+# set-based counterpart of the old per-vacancy loop: everything we need is loaded keyed by the
+# airtable ID in a few queries, creates vs updates are decided in memory and written in bulk.
+def _upsert_jobs(
+    jobs_raw: list[dict], registry: TagRegistry, stats: ImportStats, changes: IndexChanges
+):
+    ids_external = [job_raw["id"] for job_raw in jobs_raw]
+
+    posts_existing: dict[str, JobPost] = {
+        post.id_external_80_000_hours: post
+        for post in JobPost.objects.filter(
+            id_external_80_000_hours__in=ids_external,
+            version_current__isnull=False,
+        ).order_by("pk")
+    }
+    versions_last: dict[str, JobPostVersion] = {
+        version.post.id_external_80_000_hours: version
+        for version in JobPostVersion.objects.filter(
+            post__id_external_80_000_hours__in=ids_external,
+            status=PostStatus.PUBLISHED,
+        )
+        .select_related("post")
+        .order_by("created_at")
+    }
+    companies: dict[str, Company] = {
+        company.id_external_80_000_hours: company
+        for company in Company.objects.filter(
+            id_external_80_000_hours__in={
+                job_raw["Hiring organisation ID"] for job_raw in jobs_raw
+            }
+        )
+    }
+
+    posts_new: list[JobPost] = []
+    versions_new: list[JobPostVersion] = []
+    versions_updated: list[JobPostVersion] = []
+    versions_tags: list[tuple[JobPostVersion, TagNames]] = []
+    for job_raw in jobs_raw:
+        job_existing = posts_existing.get(job_raw["id"])
+
+        if job_existing and not job_existing.is_refetch_from_80_000_hours:
+            stats.unchanged += 1
+            continue
+
+        content_hash = get_content_hash(job_raw)
+        if job_existing and job_existing.content_hash_80_000_hours == content_hash:
+            stats.unchanged += 1
+            continue
+
+        company = companies.get(job_raw["Hiring organisation ID"])
+        if company is None:
+            raise Company.DoesNotExist(
+                f"Company {job_raw['Hiring organisation ID']} of job {job_raw['id']} does not exist"
+            )
 
-            if job_existing and not job_existing.is_refetch_from_80_000_hours:
+        if job_existing:
+            post_version_last = versions_last.get(job_raw["id"])
+            if post_version_last is None:
+                # eg all its versions were hidden in the admin
+                print(f"job {job_raw['id']} has no published version, skipped")
+                stats.skipped += 1
                 continue
+            versions_updated.append(post_version_last)
+        else:
+            post = JobPost(
+                id_external_80_000_hours=job_raw["id"],
+                is_refetch_from_80_000_hours=True,
+            )
+            post_version_last = JobPostVersion(status=PostStatus.PUBLISHED, post=post)
+            posts_new.append(post)
+            versions_new.append(post_version_last)
 
-            if job_existing:
-                post_version_last = (
-                    JobPostVersion.objects.filter(
-                        post__id_external_80_000_hours=job_raw["id"],
-                        status=PostStatus.PUBLISHED,
-                    )
-                    .order_by("created_at")
-                    .last()
-                )
-                _update_post_version(post_version_last, job_raw)
-            else:
-                salary = job_raw["Salary (display)"]
-                if not salary or salary == "Not Found":
-                    salary = ""
-
-                post = JobPost.objects.create(
-                    id_external_80_000_hours=job_raw["id"],
-                    is_refetch_from_80_000_hours=True,
-                )
-                post_version = JobPostVersion.objects.create(
-                    title=job_raw["Job title"],
-                    status=PostStatus.PUBLISHED,
-                    salary=salary,
-                    visa_sponsorship=job_raw["visa"],
-                    evergreen=job_raw["evergreen"],
-                    post=post,
-                )
-                post.version_current = post_version
-                post.company = Company.objects.get(
-                    id_external_80_000_hours=job_raw["Hiring organisation ID"],
-                )
-                post.save()
-                _update_post_version(post_version, job_raw)
+        post_version_last.post.company = company
+        post_version_last.post.content_hash_80_000_hours = content_hash
+        _update_post_version(post_version_last, job_raw)
+        versions_tags.append((post_version_last, _update_or_add_tags_posts(job_raw, registry)))
 
-        count = JobPostVersion.objects.all().count()
-        email_log(Task.IMPORT, Code.SUCCESS, content=f"{count} jobs imported")
-    except Exception as err:
-        email_log(Task.IMPORT, Code.FAILURE, content=f"Error:\n{err}")
-        capture_exception(err)
+    bulk_create_with_pks(
+        JobPost, posts_new, "id_external_80_000_hours", batch_size=BULK_BATCH_SIZE
+    )
+    for post, version in zip(posts_new, versions_new):
+        # sets post_id, otherwise bulk_create sets it and drops the cached post
+        version.post = post
+    # a new post has a single version
+    bulk_create_with_pks(JobPostVersion, versions_new, "post_id", batch_size=BULK_BATCH_SIZE)
+
+    now = timezone.now()
+    for version in versions_new:
+        version.post.version_current = version
+    for version in versions_updated:
+        version.updated_at = now
+        version.post.updated_at = now
+    posts_to_update = [version.post for version in versions_new + versions_updated]
+
+    JobPost.objects.bulk_update(
+        posts_to_update,
+        fields=["company", "version_current", "content_hash_80_000_hours", "updated_at"],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    JobPostVersion.objects.bulk_update(
+        versions_updated,
+        fields=JOB_POST_VERSION_IMPORTED_FIELDS + ["updated_at"],
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+    changes.tags |= registry.flush()
+    # the tag counts are refreshed once the whole import is written
+    sync_tags(
+        JobPostVersion,
+        JOB_POST_VERSION_TAG_FIELDS,
+        {version.pk: tag_names for version, tag_names in versions_tags},
+        registry,
+    )
+    # the company records list their jobs
+    for version in versions_new + versions_updated:
+        changes.jobs.add(version.post_id)
+        changes.companies.add(version.post.company_id)
+
+    stats.created += len(versions_new)
+    stats.updated += len(versions_updated)
 
 
 # this is not analogous to the above imports. This adds metadata to existing tags in the database.
 # airtable's tag IDs are not the same as our DB's tag ideas, so we find them by name and supply them with  bonus data.
-def refine_tags(tags_raw: Mapping[str, AirtableTag]):
+def refine_tags(
+    tags_raw: Mapping[str, AirtableTag],
+    registry: TagRegistry = None,
+):
+    registry = registry or TagRegistry()
     count = 0
     missing = 0
+    tags_changed: list[JobPostTag] = []
     for key in tags_raw:
         count += 1
-        tag = JobPostTag.objects.filter(name__iexact=tags_raw[key]["name"]).first()
+        tag = registry.get(tags_raw[key]["name"])
         if not tag:
             missing += 1
             continue
-        tag.link = tags_raw[key]["link"]
-        tag.save()
+        if tag.link != tags_raw[key]["link"]:
+            tag.link = tags_raw[key]["link"]
+            tags_changed.append(tag)
+    with transaction.atomic():
+        JobPostTag.objects.bulk_update(tags_changed, fields=["link"], batch_size=BULK_BATCH_SIZE)
+        enqueue_index_changes(IndexChanges(tags={tag.pk for tag in tags_changed}))
 
 
-def _cleanup_removed_jobs(jobs_raw: list[dict]):
-    jobs_new_ids: list[str] = list(map(lambda job: job["id"], jobs_raw))
+def _cleanup_removed_jobs(jobs_new_ids: list[str], changes: IndexChanges = None) -> int:
+    changes = changes or IndexChanges()
     jobs_current_ids: list[str] = JobPost.objects.exclude(
         id_external_80_000_hours=""
     ).values_list(
@@ -160,9 +409,22 @@ def _cleanup_removed_jobs(jobs_raw: list[dict]):
         flat=True,
     )
     ids_to_drop = set(jobs_current_ids) - set(jobs_new_ids)
-    JobPost.objects.filter(id_external_80_000_hours__in=ids_to_drop).delete()
+    posts_to_drop = JobPost.objects.filter(id_external_80_000_hours__in=ids_to_drop)
+    for post_pk, company_pk in posts_to_drop.values_list("pk", "company_id"):
+        changes.jobs.add(post_pk)
+        if company_pk:
+            changes.companies.add(company_pk)
+    _, deleted = posts_to_drop.delete()
+    return deleted.get(JobPost._meta.label, 0)
+
 
+def get_content_hash(record_raw: dict) -> str:
+    """Stable hash of a normalized airtable record, used to skip the unchanged ones."""
+    payload = json.dumps([IMPORT_HASH_VERSION, record_raw], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
 
+
+# only sets the fields in memory, the caller is responsible for writing them
 def _update_post_version(version: JobPostVersion, job_raw: dict):
     version.title = job_raw["Job title"]
     version.description_short = _get_job_desc(job_raw)
@@ -201,14 +463,6 @@ def _update_post_version(version: JobPostVersion, job_raw: dict):
         version.experience_min = 1
         version.experience_avg = 4
 
-    version.post.company = Company.objects.get(
-        id_external_80_000_hours=job_raw["Hiring organisation ID"]
-    )
-    version.post.save()
-    version.save()
-
-    _update_or_add_tags_posts(version, job_raw)
-
 
 def _get_job_desc(job_raw: dict) -> str:
     desc: str = job_raw["Job description"]
@@ -226,77 +480,74 @@ def update(alert: JobAlert):
     print(json)
 
 
-def _update_or_add_tags_orgs(org: Company, org_raw: dict):
-    org.tags_areas.clear()
-    org.tags_locations.clear()
+def _update_or_add_tags_orgs(org_raw: dict, registry: TagRegistry) -> TagNames:
+    tag_names: TagNames = defaultdict(list)
 
     for area in org_raw["tags"]:
         add_tag_org(
-            org=org,
+            tag_names=tag_names,
             tag_name=area,
             tag_type=JobPostTagTypeEnum.AREA,
+            registry=registry,
         )
 
     for location in org_raw["locations"]:
         add_tag_org(
-            org=org,
+            tag_names=tag_names,
             tag_name=location,
             tag_type=JobPostTagTypeEnum.LOCATION_80K,
+            registry=registry,
         )
 
     if len(org_raw["region"]) and org_raw["region"][0] is not None:
         add_tag_org(
-            org=org, tag_name=org_raw["region"][0], tag_type=JobPostTagTypeEnum.LOCATION_80K
+            tag_names=tag_names,
+            tag_name=org_raw["region"][0],
+            tag_type=JobPostTagTypeEnum.LOCATION_80K,
+            registry=registry,
         )
 
+    return tag_names
 
-def _update_or_add_tags_posts(post_version: JobPostVersion, job_raw: dict):
-    post_version.tags_generic.clear()
-    post_version.tags_area.clear()
-    post_version.tags_area_filter.clear()
-    post_version.tags_degree_required.clear()
-    post_version.tags_exp_required.clear()
-    post_version.tags_country.clear()
-    post_version.tags_city.clear()
-    post_version.tags_role_type.clear()
-    post_version.tags_location_type.clear()
-    post_version.tags_location_80k.clear()
-    post_version.tags_workload.clear()
-    post_version.tags_skill.clear()
-    post_version.tags_immigration.clear()
+
+def _update_or_add_tags_posts(job_raw: dict, registry: TagRegistry) -> TagNames:
+    tag_names: TagNames = defaultdict(list)
 
     for role_type in job_raw["Role types"]:
         add_tag_post(
-            post=post_version,
+            tag_names=tag_names,
             tag_name=role_type,
             tag_type=JobPostTagTypeEnum.ROLE_TYPE,
+            registry=registry,
         )
 
     #  these guys might have !Link for tag as well?
-    pattern = re.compile(r"\w+\. ")  # account for API oddity for now.
     for area in job_raw["Problem areas"]:
-        regexed_area = pattern.sub("", area, 1)
+        regexed_area = AREA_NUMBER_PATTERN.sub("", area, 1)
         add_tag_post(
-            post=post_version,
+            tag_names=tag_names,
             tag_name=regexed_area,
             tag_type=JobPostTagTypeEnum.AREA,
+            registry=registry,
             concat="_filter",
         )
 
     # todo these guys have !Link for tag!
     for area in job_raw["Problem area (tags)"]:
-        regexed_area = pattern.sub("", area, 1)
+        regexed_area = AREA_NUMBER_PATTERN.sub("", area, 1)
         add_tag_post(
-            post=post_version,
+            tag_names=tag_names,
             tag_name=regexed_area,
             tag_type=JobPostTagTypeEnum.AREA,
+            registry=registry,
         )
 
     if job_raw["Degree requirements"]:
         add_tag_post(
-            post_version,
+            tag_names,
             tag_name=job_raw["Degree requirements"],
             tag_type=JobPostTagTypeEnum.DEGREE_REQUIRED,
+            registry=registry,
         )
 
     exp_min: str = (
@@ -307,87 +558,78 @@ def _update_or_add_tags_posts(post_version: JobPostVersion, job_raw: dict):
 
     if exp_min:
         add_tag_post(
-            post_version,
+            tag_names,
             tag_name=exp_min,
             tag_type=JobPostTagTypeEnum.EXP_REQUIRED,
+            registry=registry,
         )
 
     for region in job_raw["Region"]:
         if region is not None:
             # we are counting regions as countries
             add_tag_post(
-                post=post_version,
+                tag_names=tag_names,
                 tag_name=region,
                 tag_type=JobPostTagTypeEnum.COUNTRY,
+                registry=registry,
             )
 
             add_tag_post(
-                post=post_version,
+                tag_names=tag_names,
                 tag_name=region,
                 tag_type=JobPostTagTypeEnum.LOCATION_80K,
+                registry=registry,
             )
 
     if job_raw["Locations"]:
         for city in job_raw["Locations"]["citiesAndCountries"]:
-            if city == "":
-                continue
-
-            if "remote" in city.lower():
-                add_tag_post(
-                    post=post_version,
-                    tag_name="Remote",
-                    tag_type=JobPostTagTypeEnum.LOCATION_TYPE,
-                )
-            elif city != "Remote":
-                # patch while api-builder is fixed
-                if city[-1] == ",":
-                    add_tag_post(
-                        post=post_version,
-                        tag_name=city[:-1],
-                        tag_type=JobPostTagTypeEnum.COUNTRY,
-                    )
-                elif city[0] != ",":  # patch conditional while api-builder is fixed
-                    add_tag_post(
-                        post=post_version,
-                        tag_name=city,
-                        tag_type=JobPostTagTypeEnum.CITY,
-                    )
-            add_tag_post(
-                post=post_version,
-                tag_name=city,
-                tag_type=JobPostTagTypeEnum.LOCATION_80K,
-            )
+            for tag_name, tag_type in _get_city_tags(city):
+                add_tag_post(tag_names, tag_name=tag_name, tag_type=tag_type, registry=registry)
 
         for country in job_raw["Locations"]["countries"]:
-            if country == "":
-                continue
+            for tag_name, tag_type in _get_country_tags(country):
+                add_tag_post(tag_names, tag_name=tag_name, tag_type=tag_type, registry=registry)
 
-            if "remote" in country.lower():
-                add_tag_post(
-                    post=post_version,
-                    tag_name="Remote",
-                    tag_type=JobPostTagTypeEnum.LOCATION_TYPE,
-                )
-
-            elif country == "Global":
-                add_tag_post(
-                    post=post_version,
-                    tag_name="Remote, Global",
-                    tag_type=JobPostTagTypeEnum.COUNTRY,
-                )
-
-            elif country != "Remote":
-                add_tag_post(
-                    post=post_version,
-                    tag_name=country,
-                    tag_type=JobPostTagTypeEnum.COUNTRY,
-                )
+    return tag_names
+
+
+# The tags of a location only depend on its name, and there are only a few hundred locations, so
+# they are derived once per name and sync instead of once per vacancy.
+LocationTags = tuple[tuple[str, JobPostTagTypeEnum], ...]
+
+
+@lru_cache(maxsize=None)
+def _get_city_tags(city: str) -> LocationTags:
+    if city == "":
+        return ()
+
+    tags = []
+    if "remote" in city.lower():
+        tags.append(("Remote", JobPostTagTypeEnum.LOCATION_TYPE))
+    elif city != "Remote":
+        # patch while api-builder is fixed
+        if city[-1] == ",":
+            tags.append((city[:-1], JobPostTagTypeEnum.COUNTRY))
+        elif city[0] != ",":  # patch conditional while api-builder is fixed
+            tags.append((city, JobPostTagTypeEnum.CITY))
+    tags.append((city, JobPostTagTypeEnum.LOCATION_80K))
+    return tuple(tags)
 
-            add_tag_post(
-                post=post_version,
-                tag_name=country,
-                tag_type=JobPostTagTypeEnum.LOCATION_80K,
-            )
+
+@lru_cache(maxsize=None)
+def _get_country_tags(country: str) -> LocationTags:
+    if country == "":
+        return ()
+
+    tags = []
+    if "remote" in country.lower():
+        tags.append(("Remote", JobPostTagTypeEnum.LOCATION_TYPE))
+    elif country == "Global":
+        tags.append(("Remote, Global", JobPostTagTypeEnum.COUNTRY))
+    elif country != "Remote":
+        tags.append((country, JobPostTagTypeEnum.COUNTRY))
+    tags.append((country, JobPostTagTypeEnum.LOCATION_80K))
+    return tuple(tags)
 
 
 def _strip_all_json_strings(jobs_raw: list[dict]) -> list[dict]:
@@ -400,56 +642,33 @@ def _strip_all_json_strings(jobs_raw: list[dict]) -> list[dict]:
 
 
 def add_tag_post(
-    post: JobPostVersion,
+    tag_names: TagNames,
     tag_name: str,
     tag_type: JobPostTagTypeEnum,
+    registry: TagRegistry,
     concat="",
 ):
-    tag = JobPostTag.objects.filter(name__iexact=tag_name).first()
-    if not tag:
-        tag = JobPostTag.objects.create(
-            name=tag_name,
-            status=PostJobTagStatus.APPROVED,
-        )
-    tag_type_instance = JobPostTagType.objects.get(type=tag_type)
-    tag.types.add(tag_type_instance)
-    tag.save()
-    if len(concat):
-        getattr(post, f"tags_{tag_type.value}" + concat).add(tag)
-    else:
-        getattr(post, f"tags_{tag_type.value}").add(tag)
+    registry.add(tag_name, tag_type)
+    tag_names[f"tags_{tag_type.value}" + concat].append(tag_name)
 
 
 # basically a duplicate for now
-def add_tag_org(org: Company, tag_name: str, tag_type: JobPostTagTypeEnum):
-    tag = JobPostTag.objects.filter(name__iexact=tag_name).first()
-    if not tag:
-        tag = JobPostTag.objects.create(
-            name=tag_name,
-            status=PostJobTagStatus.APPROVED,
-        )
-    tag_type_instance = JobPostTagType.objects.get(type=tag_type)
-    tag.types.add(tag_type_instance)
-    tag.save()
+def add_tag_org(
+    tag_names: TagNames,
+    tag_name: str,
+    tag_type: JobPostTagTypeEnum,
+    registry: TagRegistry,
+):
+    registry.add(tag_name, tag_type)
 
     if tag_type.value == "area":
-        getattr(org, "tags_areas").add(tag)
+        tag_names["tags_areas"].append(tag_name)
     elif tag_type.value == "location_80k":
-        getattr(org, "tags_locations").add(tag)
+        tag_names["tags_locations"].append(tag_name)
 
 
-def add_headquarters(org: Company, hq_name: str):
+def add_headquarters(hq_name: str, registry: TagRegistry) -> bool:
     if len(hq_name) == 0:
-        return
-    hq = JobPostTag.objects.filter(name__iexact=hq_name).first()
-    if not hq:
-        hq = JobPostTag.objects.create(
-            name=hq_name,
-            status=PostJobTagStatus.APPROVED,
-        )
-    hq_type_instance = JobPostTagType.objects.get(type=JobPostTagTypeEnum.LOCATION_80K)
-    hq.types.add(hq_type_instance)
-    hq.save()
-
-    org.headquarters = hq
-    org.save()
+        return False
+    registry.add(hq_name, JobPostTagTypeEnum.LOCATION_80K)
+    return True
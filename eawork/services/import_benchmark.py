@@ -0,0 +1,176 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+
+from django.conf import settings
+from django.db import connection
+from django.db import transaction
+from django.test import override_settings
+
+from eawork.models import Company
+from eawork.models import JobPost
+from eawork.models import JobPostTag
+from eawork.services.airtable import import_from_airtable
+from eawork.services.import_80_000_hours import ImportStats
+from eawork.services.import_80_000_hours import _cleanup_removed_jobs
+from eawork.services.import_80_000_hours import import_companies
+from eawork.services.import_80_000_hours import import_jobs
+from eawork.services.import_80_000_hours import refine_tags
+from eawork.services.search_index import disable_index_events
+from eawork.services.tags import TagRegistry
+from eawork.services.tags import disable_tag_count_events
+
+
+# Benchmarks the import phases against synthetic airtable data of increasing size. Every size
+# runs in a transaction that is rolled back, starting from empty import tables, so the numbers
+# don't depend on what's in the database. Meant for a local database only, Postgres or SQLite,
+# and the numbers are only comparable between runs on the same one (see `get_report`).
+
+ORGS_PER_VACANCY = 0.3
+CLEANUP_REMOVED_RATIO = 0.1
+
+
+@dataclass
+class PhaseResult:
+    name: str
+    seconds: float = 0.0
+    queries: int = 0
+    rows_written: int = 0
+    peak_memory_kb: int = 0
+
+
+@dataclass
+class SizeResult:
+    size: int  # the requested number of vacancies
+    orgs_requested: int
+    # as imported, which can be less than requested, eg when the source caps the records
+    vacancies: int = 0
+    orgs: int = 0
+    phases: list[PhaseResult] = field(default_factory=list)
+
+    def get_phase(self, name: str) -> PhaseResult:
+        return next(phase for phase in self.phases if phase.name == name)
+
+
+class _Rollback(Exception):
+    pass
+
+
+# tracing the memory slows the phases down about 2x, so the times are only comparable between
+# runs with the same `is_trace_memory`
+def run_import_benchmark(
+    sizes: list[int], seed: int = 0, is_trace_memory: bool = True
+) -> list[SizeResult]:
+    results = []
+    for size in sizes:
+        result = SizeResult(size=size, orgs_requested=max(1, int(size * ORGS_PER_VACANCY)))
+        print(f"benchmark {result.size} vacancies, {result.orgs_requested} orgs")
+        try:
+            with disable_index_events(), disable_tag_count_events(), transaction.atomic():
+                # import_jobs reports every run by email
+                with override_settings(
+                    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"
+                ):
+                    _run_phases(result, seed, is_trace_memory)
+                    raise _Rollback()
+        except _Rollback:
+            pass
+        for phase in result.phases:
+            print(f"  {phase}")
+        results.append(result)
+    return results
+
+
+def get_report(results: list[SizeResult], is_trace_memory: bool = True) -> dict:
+    return {
+        "database": connection.vendor,
+        "is_trace_memory": is_trace_memory,
+        "sizes": [asdict(result) for result in results],
+    }
+
+
+def _run_phases(result: SizeResult, seed: int, is_trace_memory: bool):
+    JobPost.objects.all().delete()
+    Company.objects.all().delete()
+    JobPostTag.objects.all().delete()
+
+    # the vacancies and orgs are streamed from airtable, so their fetch is part of the import
+    # phases, and "fetch" only covers the dropdowns and locations
+    with _use_synthetic_airtable(result, seed):
+        with _measure(result, is_trace_memory, "fetch"):
+            data_raw = import_from_airtable()["data"]
+        with _measure(result, is_trace_memory, "import_companies"):
+            registry = TagRegistry()
+            result.orgs = _count_imported(import_companies(data_raw, registry=registry))
+        with _measure(result, is_trace_memory, "import_jobs"):
+            result.vacancies = _count_imported(
+                _check_import(import_jobs(data_raw, registry=registry))
+            )
+        with _measure(result, is_trace_memory, "refine_tags"):
+            refine_tags(data_raw["problem_area_tags"], registry=registry)
+
+        with _measure(result, is_trace_memory, "import_jobs_unchanged"):
+            _check_import(import_jobs(import_from_airtable()["data"], registry=TagRegistry()))
+
+    # the same vacancy IDs with other content, so every vacancy is updated
+    with _use_synthetic_airtable(result, seed + 1):
+        with _measure(result, is_trace_memory, "import_jobs_changed"):
+            data_changed = import_from_airtable()["data"]
+            registry = TagRegistry()
+            import_companies(data_changed, registry=registry)
+            _check_import(import_jobs(data_changed, registry=registry))
+
+        ids_kept = [vacancy["id"] for vacancy in import_from_airtable()["data"]["vacancies"]]
+    ids_kept = ids_kept[: int(len(ids_kept) * (1 - CLEANUP_REMOVED_RATIO))]
+    with _measure(result, is_trace_memory, "_cleanup_removed_jobs"):
+        _cleanup_removed_jobs(ids_kept)
+
+
+def _use_synthetic_airtable(result: SizeResult, seed: int) -> override_settings:
+    return override_settings(
+        AIRTABLE={
+            **settings.AIRTABLE,
+            "SOURCE": "synthetic",
+            "SYNTHETIC_VACANCIES": result.size,
+            "SYNTHETIC_ORGS": result.orgs_requested,
+            "SYNTHETIC_SEED": seed,
+        }
+    )
+
+
+def _check_import(stats: ImportStats | None) -> ImportStats:
+    if stats is None:
+        raise RuntimeError("The import failed, see the log email")
+    return stats
+
+
+def _count_imported(stats: ImportStats) -> int:
+    return stats.created + stats.updated + stats.unchanged
+
+
+@contextmanager
+def _measure(result: SizeResult, is_trace_memory: bool, name: str):
+    phase = PhaseResult(name=name)
+
+    def count_query(execute, sql, params, many, context):
+        phase.queries += 1
+        returned = execute(sql, params, many, context)
+        if sql.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+            phase.rows_written += max(context["cursor"].rowcount, 0)
+        return returned
+
+    if is_trace_memory:
+        tracemalloc.start()
+    started_at = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count_query):
+            yield phase
+    finally:
+        phase.seconds = round(time.perf_counter() - started_at, 3)
+        if is_trace_memory:
+            phase.peak_memory_kb = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+    result.phases.append(phase)
@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+
+from algoliasearch_django import algolia_engine
+from django.db import transaction
+from django.db.models import Model
+
+from eawork.models import JobPostVersion
+from eawork.models import SearchIndexEvent
+from eawork.services.search_index import INDEXED_MODELS
+from eawork.services.search_index import enqueue_index_events
+
+
+REPORT_IDS_MAX = 20
+
+
+@dataclass
+class ParityReport:
+    index_name: str
+    records: int
+    records_expected: int
+    object_ids_missing: set[str]  # should be indexed but aren't
+    object_ids_extra: set[str]  # are indexed but shouldn't be
+    records_pending: int = 0  # with outbox events, left out of the diff
+
+    def is_ok(self) -> bool:
+        return not self.object_ids_missing and not self.object_ids_extra
+
+    def __str__(self) -> str:
+        return (
+            f"{self.index_name}: {self.records} records, {self.records_expected} expected, "
+            f"missing {_format_ids(self.object_ids_missing)}, "
+            f"extra {_format_ids(self.object_ids_extra)}, "
+            f"{self.records_pending} pending"
+        )
+
+
+def check_index_parity(is_repair: bool = False) -> list[ParityReport]:
+    """
+    Diffs the objectIDs of every index, streamed with the browse API, against the objectIDs
+    that should be indexed, computed with one query per index. With `is_repair` the missing and
+    extra records are enqueued in the outbox, which pushes their current state.
+
+    The objects with events still in the outbox are left out, their records are about to change.
+    """
+    reports = []
+    for model in INDEXED_MODELS:
+        adapter = algolia_engine.get_adapter(model)
+        index = algolia_engine.client.init_index(adapter.index_name)
+        hits = index.browse_objects({"attributesToRetrieve": ["objectID"]})
+        object_ids_indexed = {str(hit["objectID"]) for hit in hits}
+        object_ids_expected = {str(object_id) for object_id in _get_object_ids_expected(model)}
+        # read last, so it also covers the objects changed during the browse
+        object_ids_pending = set(
+            SearchIndexEvent.objects.filter(model=model._meta.label).values_list(
+                "object_id", flat=True
+            )
+        )
+        report = ParityReport(
+            index_name=adapter.index_name,
+            records=len(object_ids_indexed),
+            records_expected=len(object_ids_expected),
+            object_ids_missing=object_ids_expected - object_ids_indexed - object_ids_pending,
+            object_ids_extra=object_ids_indexed - object_ids_expected - object_ids_pending,
+            records_pending=len(object_ids_pending),
+        )
+        print(report)
+        if is_repair and not report.is_ok():
+            with transaction.atomic():
+                enqueue_index_events(model, report.object_ids_missing | report.object_ids_extra)
+        reports.append(report)
+    return reports
+
+
+def _get_object_ids_expected(model: type[Model]) -> list:
+    if model is JobPostVersion:
+        # the objectID is the post pk
+        return JobPostVersion.objects.should_submit_to_algolia().values_list(
+            "post_id", flat=True
+        )
+    # the tags and companies are all indexed
+    return model.objects.values_list("pk", flat=True)
+
+
+def _format_ids(object_ids: set[str]) -> str:
+    object_ids_shown = ", ".join(sorted(object_ids)[:REPORT_IDS_MAX])
+    if len(object_ids) > REPORT_IDS_MAX:
+        object_ids_shown += ", ..."
+    return f"{len(object_ids)} ({object_ids_shown})" if object_ids else "0"
@@ -0,0 +1,251 @@
+import bisect
+import json
+import math
+import operator
+import re
+from collections import defaultdict
+
+from algoliasearch.http.serializer import DataSerializer
+from algoliasearch_django import algolia_engine
+from algoliasearch_django import raw_search
+from django.conf import settings
+
+from eawork.models import JobPostVersion
+
+
+HITS_PER_PAGE_DEFAULT = 20
+BROWSE_HITS_PER_PAGE = 1000  # the max of Algolia
+
+# the record attributes matched by `query`
+SEARCHABLE_ATTRIBUTES = [
+    "title",
+    "company_name",
+    "description_for_search",
+    "tags_generic",
+    "tags_area",
+    "tags_country",
+    "tags_city",
+    "tags_role_type",
+    "tags_skill",
+]
+
+NUMERIC_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    "=": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    ">": operator.gt,
+}
+NUMERIC_FILTER_PATTERN = re.compile(r"^\s*(\w+)\s*(<=|>=|!=|<|>|=)\s*(-?[\d.]+)\s*$")
+
+
+class SearchBackend:
+    """A search of the jobs index, answering in the response format of Algolia's search API."""
+
+    def search(self, query: str = "", params: dict = None) -> dict:
+        raise NotImplementedError
+
+    def browse(self, query: str = "", params: dict = None) -> list[dict]:
+        """
+        All the hits of a search, fetched page by page. Raises if fewer hits come back than the
+        search found, rather than silently returning the first ones.
+        """
+        hits, hits_count = self._search_pages(query, params)
+        if len(hits) < hits_count:
+            raise RuntimeError(f"The search returned {len(hits)} of {hits_count} hits")
+        return hits
+
+    def search_ranked(self, query: str = "", params: dict = None) -> list[dict]:
+        """
+        All the hits of a search in ranking order. The hits past the pagination limit of the
+        index follow in browse order.
+        """
+        hits, hits_count = self._search_pages(query, params)
+        if len(hits) < hits_count:
+            object_ids = {hit["objectID"] for hit in hits}
+            hits += [
+                hit for hit in self.browse(query, params) if hit["objectID"] not in object_ids
+            ]
+        return hits
+
+    def _search_pages(self, query: str, params: dict | None) -> tuple[list[dict], int]:
+        params = {"hitsPerPage": BROWSE_HITS_PER_PAGE, **(params or {})}
+        hits = []
+        page = 0
+        while True:
+            res_json = self.search(query=query, params={**params, "page": page})
+            hits += res_json["hits"]
+            page += 1
+            if page >= res_json.get("nbPages", 0):
+                break
+        return hits, res_json["nbHits"]
+
+
+class AlgoliaSearchBackend(SearchBackend):
+    def search(self, query: str = "", params: dict = None) -> dict:
+        return raw_search(model=JobPostVersion, query=query, params=params or {})
+
+    def browse(self, query: str = "", params: dict = None) -> list[dict]:
+        # the browse API isn't capped by `paginationLimitedTo`, unlike the pages of a search
+        index_name = algolia_engine.get_adapter(JobPostVersion).index_name
+        params = {key: value for key, value in (params or {}).items() if key != "page"}
+        browse_params = {**params, "query": query}
+        return list(algolia_engine.client.init_index(index_name).browse_objects(browse_params))
+
+
+class LocalSearchBackend(SearchBackend):
+    """
+    In-process stand-in of the jobs index, for offline benchmarks and tests, or when Algolia is
+    degraded. The records `JobsIndex` would push are loaded on the first search, and the words
+    of SEARCHABLE_ATTRIBUTES and the facet values are kept in inverted indices.
+
+    Supports `query` (every word must match, the last one as a prefix, like Algolia does),
+    `facetFilters`, numeric `filters` and `numericFilters` joined by AND, `hitsPerPage` and
+    `page`. The hits are ordered by `posted_at`, newest first.
+    """
+
+    def __init__(self, records: list[dict] = None):
+        self.records = records
+        self._words: dict[str, set[int]] = defaultdict(set)
+        self._vocabulary: list[str] = []
+        self._facets: dict[tuple[str, str], set[int]] = defaultdict(set)
+        if records is not None:
+            self._build()
+
+    def search(self, query: str = "", params: dict = None) -> dict:
+        if self.records is None:
+            self.records = _load_records()
+            self._build()
+        params = params or {}
+
+        positions = self._match_query(query)
+        for facet_filter in _as_list(params.get("facetFilters", [])):
+            positions &= self._match_facet_filter(facet_filter)
+
+        numeric_filters = _as_list(params.get("numericFilters", []))
+        if params.get("filters"):
+            numeric_filters += re.split(r"\s+AND\s+", params["filters"], flags=re.IGNORECASE)
+        hits = [
+            self.records[position]
+            for position in sorted(positions)
+            if all(
+                self._is_numeric_match(self.records[position], numeric_filter)
+                for numeric_filter in numeric_filters
+            )
+        ]
+
+        hits_per_page = params.get("hitsPerPage", HITS_PER_PAGE_DEFAULT)
+        page = params.get("page", 0)
+        hits_page = hits[page * hits_per_page : (page + 1) * hits_per_page]
+        return {
+            "hits": [dict(hit) for hit in hits_page],  # copies, the callers annotate the hits
+            "nbHits": len(hits),
+            "page": page,
+            "nbPages": math.ceil(len(hits) / hits_per_page) if hits_per_page else 0,
+            "hitsPerPage": hits_per_page,
+            "query": query,
+        }
+
+    def _build(self):
+        self.records.sort(key=lambda record: record.get("posted_at") or 0, reverse=True)
+        for position, record in enumerate(self.records):
+            for word in get_record_words(record):
+                self._words[word].add(position)
+            for attribute, value in record.items():
+                for facet_value in get_facet_values(value):
+                    self._facets[(attribute, facet_value)].add(position)
+        self._vocabulary = sorted(self._words)
+
+    def _match_query(self, query: str) -> set[int]:
+        words = get_words(query)
+        positions = set(range(len(self.records)))
+        for word in words[:-1]:
+            positions &= self._words.get(word, set())
+        if words:
+            positions &= self._match_prefix(words[-1])
+        return positions
+
+    def _match_prefix(self, prefix: str) -> set[int]:
+        positions = set()
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for word in self._vocabulary[start:]:
+            if not word.startswith(prefix):
+                break
+            positions |= self._words[word]
+        return positions
+
+    # a string is a single filter, a list an OR of them
+    def _match_facet_filter(self, facet_filter: str | list[str]) -> set[int]:
+        positions = set()
+        for facet_filter_single in _as_list(facet_filter):
+            attribute, _, value = facet_filter_single.partition(":")
+            if value.startswith("-"):
+                positions |= set(range(len(self.records))) - self._facets.get(
+                    (attribute, value[1:]), set()
+                )
+            else:
+                positions |= self._facets.get((attribute, value), set())
+        return positions
+
+    def _is_numeric_match(self, record: dict, numeric_filter: str | list[str]) -> bool:
+        for numeric_filter_single in _as_list(numeric_filter):
+            match = NUMERIC_FILTER_PATTERN.match(numeric_filter_single)
+            if not match:
+                raise ValueError(f"Unsupported numeric filter: {numeric_filter_single}")
+            attribute, operator_name, number = match.groups()
+            value = record.get(attribute)
+            if value is not None and NUMERIC_OPERATORS[operator_name](value, float(number)):
+                return True
+        return False
+
+
+def get_search_backend() -> SearchBackend:
+    # a local backend loads the records on its first search, so reuse it for a whole run
+    if settings.SEARCH_BACKEND == "local":
+        return LocalSearchBackend()
+    return AlgoliaSearchBackend()
+
+
+def is_search_enabled() -> bool:
+    return settings.SEARCH_BACKEND == "local" or settings.IS_ENABLE_ALGOLIA
+
+
+def _load_records() -> list[dict]:
+    from eawork.index import JobsIndex
+
+    adapter = JobsIndex(JobPostVersion, algolia_engine.client, settings.ALGOLIA)
+    # serialized like the Algolia client does it, eg the datetimes become timestamps
+    return [
+        json.loads(DataSerializer.serialize(adapter.get_raw_record(version)))
+        for version in adapter.get_queryset()
+        if adapter._should_index(version)
+    ]
+
+
+def get_record_words(record: dict) -> set[str]:
+    return {
+        word for attribute in SEARCHABLE_ATTRIBUTES for word in get_words(record.get(attribute))
+    }
+
+
+def get_words(text) -> list[str]:
+    if isinstance(text, list):
+        return [word for item in text for word in get_words(item)]
+    if not isinstance(text, str):
+        return []
+    return re.findall(r"\w+", text.casefold())
+
+
+def get_facet_values(value) -> list[str]:
+    if isinstance(value, bool):
+        return [str(value).lower()]
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, str)]
+    if isinstance(value, str):
+        return [value]
+    return []
+
+
+def _as_list(value) -> list:
+    return list(value) if isinstance(value, list) else [value]
@@ -0,0 +1,371 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ContextDecorator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from datetime import timedelta
+from typing import Iterable
+
+from algoliasearch_django import algolia_engine
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db import transaction
+from django.db.models import F
+from django.db.models import Model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.utils import timezone
+from sentry_sdk import capture_exception
+
+from eawork.models import Company
+from eawork.models import JobPost
+from eawork.models import JobPostTag
+from eawork.models import JobPostVersion
+from eawork.models import SearchIndexEvent
+from eawork.services.bulk import BULK_BATCH_SIZE
+from eawork.services.companies import refresh_company_projections
+from eawork.services.streaming import batched
+
+
+PUSH_BATCH_SIZE = 1000
+RETRY_DELAY = timedelta(seconds=30)
+RETRY_DELAY_MAX = timedelta(hours=1)
+# longer than any push of a batch, after it the events of a worker that died are retried
+PUSH_CLAIM_TIMEOUT = timedelta(minutes=10)
+# any constant shared by the workers, so that only one of them drains the outbox at a time
+PUSH_LOCK_KEY = 80_000
+
+# the models whose writes outdate an Algolia record
+INDEX_EVENT_SENDERS = [JobPostVersion, JobPost, JobPostTag, Company]
+INDEXED_MODELS = [JobPostVersion, JobPostTag, Company]
+
+
+@dataclass
+class IndexChanges:
+    """
+    The rows whose Algolia records are outdated after an import, collected by the import steps
+    and enqueued as outbox events, so that only those are pushed instead of a full reindex.
+    """
+
+    jobs: set[int] = field(default_factory=set)  # objectIDs of the jobs index, ie post pks
+    tags: set[int] = field(default_factory=set)
+    companies: set[int] = field(default_factory=set)
+
+    def __str__(self) -> str:
+        return f"{len(self.jobs)} jobs, {len(self.tags)} tags, {len(self.companies)} companies"
+
+
+@dataclass
+class ReindexResult:
+    index_name: str
+    records: int
+    records_indexed: int  # as reported by the temporary index
+
+    def is_valid(self) -> bool:
+        return self.records == self.records_indexed
+
+    def __str__(self) -> str:
+        return f"{self.index_name}: {self.records_indexed} of {self.records} records indexed"
+
+
+def enqueue_index_changes(changes: IndexChanges):
+    print(f"enqueue algolia updates: {changes}")
+    enqueue_index_events(JobPostVersion, changes.jobs)
+    enqueue_index_events(JobPostTag, changes.tags)
+    enqueue_index_events(Company, changes.companies)
+
+
+def enqueue_index_events(model: type[Model], object_ids: Iterable):
+    """
+    Records that the Algolia records of `model` with the given objectIDs are outdated. Call it
+    inside the transaction of the write, the push is scheduled once that commits.
+    """
+    if not settings.IS_ENABLE_ALGOLIA:
+        return
+    events = [
+        SearchIndexEvent(model=model._meta.label, object_id=str(object_id))
+        for object_id in object_ids
+    ]
+    if events:
+        SearchIndexEvent.objects.bulk_create(events, batch_size=BULK_BATCH_SIZE)
+        transaction.on_commit(_schedule_push)
+
+
+def _schedule_push():
+    from eawork.tasks import push_search_index_events
+
+    try:
+        push_search_index_events.delay()
+    except Exception as err:
+        # the events stay in the outbox for the periodic push
+        capture_exception(err)
+
+
+def _on_change(sender, instance: Model, **kwargs):
+    # the company records list their jobs
+    if isinstance(instance, JobPostVersion):
+        if instance.post_id:
+            enqueue_index_events(JobPostVersion, [instance.post_id])
+            enqueue_index_events(
+                Company,
+                JobPost.objects.filter(pk=instance.post_id, company__isnull=False).values_list(
+                    "company_id", flat=True
+                ),
+            )
+    elif isinstance(instance, JobPost):
+        enqueue_index_events(JobPostVersion, [instance.pk])
+        if instance.company_id:
+            enqueue_index_events(Company, [instance.company_id])
+    else:
+        enqueue_index_events(sender, [instance.pk])
+
+
+def connect_index_events():
+    for model in INDEX_EVENT_SENDERS:
+        post_save.connect(_on_change, sender=model, dispatch_uid="search_index_event")
+        post_delete.connect(_on_change, sender=model, dispatch_uid="search_index_event")
+
+
+class disable_index_events(ContextDecorator):
+    """
+    For bulk writes that enqueue their own `IndexChanges`, eg the import, where a receiver would
+    also make Django's cascade deletes fetch and signal every row.
+    """
+
+    def __enter__(self):
+        self.is_connected = False
+        for model in INDEX_EVENT_SENDERS:
+            self.is_connected |= post_save.disconnect(
+                sender=model, dispatch_uid="search_index_event"
+            )
+            post_delete.disconnect(sender=model, dispatch_uid="search_index_event")
+
+    def __exit__(self, *exc_info):
+        if self.is_connected:
+            connect_index_events()
+
+
+def push_index_events(batch_size: int = PUSH_BATCH_SIZE) -> int:
+    """
+    Pushes the current state of the objects of one batch of due outbox events to Algolia and
+    returns the number of events handled, or 0 if another worker is pushing already.
+
+    Repeated events of an object collapse into a single record. If a push fails its events are
+    retried with an exponential backoff, the other models of the batch aren't held back.
+
+    The batch is claimed and settled in two short transactions, the Algolia calls in between run
+    outside of any. A claim that is never settled, eg because the worker died, expires after
+    `PUSH_CLAIM_TIMEOUT`.
+    """
+    with _try_lock_pushes() as is_locked:
+        if not is_locked:
+            return 0
+
+        events = _claim_events(batch_size)
+        events_by_model: dict[str, list[SearchIndexEvent]] = defaultdict(list)
+        for event in events:
+            events_by_model[event.model].append(event)
+
+        events_done: list[SearchIndexEvent] = []
+        events_failed: list[SearchIndexEvent] = []
+        for label, events_of_model in events_by_model.items():
+            try:
+                _push_current_state(
+                    apps.get_model(label), {event.object_id for event in events_of_model}
+                )
+                events_done += events_of_model
+            except Exception as err:
+                capture_exception(err)
+                events_failed += events_of_model
+
+        _settle_events(events_done, events_failed)
+
+    if events:
+        print(f"pushed {len(events_done)} algolia updates, {len(events_failed)} failed")
+    return len(events)
+
+
+def _claim_events(batch_size: int) -> list[SearchIndexEvent]:
+    now = timezone.now()
+    with transaction.atomic():
+        events: list[SearchIndexEvent] = list(
+            SearchIndexEvent.objects.select_for_update(skip_locked=True)
+            .filter(retry_at__lte=now)
+            .order_by("pk")[:batch_size]
+        )
+        SearchIndexEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            retry_at=now + PUSH_CLAIM_TIMEOUT
+        )
+    return events
+
+
+def _settle_events(events_done: list[SearchIndexEvent], events_failed: list[SearchIndexEvent]):
+    now = timezone.now()
+    for event in events_failed:
+        event.attempts += 1
+        event.retry_at = now + get_retry_delay(event.attempts)
+    with transaction.atomic():
+        SearchIndexEvent.objects.filter(pk__in=[event.pk for event in events_done]).delete()
+        SearchIndexEvent.objects.bulk_update(
+            events_failed, fields=["attempts", "retry_at"], batch_size=BULK_BATCH_SIZE
+        )
+
+
+def delete_expired_jobs(expired_since: datetime | None, expired_until: datetime) -> int:
+    """
+    Deletes the records of the jobs that expired, ie closed more than a day ago, within the
+    given range in one batch call, instead of waiting for the next import or reindex. Returns
+    the number of deleted records.
+    """
+    versions = JobPostVersion.objects.filter(
+        post__version_current=F("pk"), closes_at__lt=expired_until - timedelta(1)
+    )
+    if expired_since:
+        versions = versions.filter(closes_at__gte=expired_since - timedelta(1))
+    object_ids = {str(post_pk) for post_pk in versions.values_list("post_id", flat=True)}
+    _push(JobPostVersion, [], object_ids)
+    return len(object_ids)
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    return min(RETRY_DELAY * 2 ** (attempts - 1), RETRY_DELAY_MAX)
+
+
+def _push_current_state(model: type[Model], object_ids: set[str]):
+    if model is Company:
+        refresh_company_projections(object_ids)
+
+    adapter = algolia_engine.get_adapter(model)
+    records = []
+    object_ids_deleted = set(object_ids)
+    for instance in _get_instances(model, object_ids):
+        if adapter._should_index(instance):
+            records.append(adapter.get_raw_record(instance))
+            object_ids_deleted.discard(str(adapter.objectID(instance)))
+    _push(model, records, object_ids_deleted)
+
+
+def _get_instances(model: type[Model], object_ids: set[str]) -> QuerySet:
+    if model is JobPostVersion:
+        # only the indexable current versions, the records of the other posts are deleted
+        return (
+            algolia_engine.get_adapter(JobPostVersion).get_queryset().filter(post__in=object_ids)
+        )
+    return model.objects.filter(pk__in=object_ids)
+
+
+def _push(model: type[Model], records: list[dict], object_ids_deleted: set):
+    # the client splits the objects into batch requests of 1000
+    index = algolia_engine.client.init_index(algolia_engine.get_adapter(model).index_name)
+    if records:
+        index.save_objects(records)
+    if object_ids_deleted:
+        index.delete_objects(list(object_ids_deleted))
+
+
+def reindex_blue_green() -> list[ReindexResult]:
+    """
+    Rebuilds the three indices into temporary ones concurrently, and only once all of them are
+    complete and their record counts check out moves them into place, right after one another.
+    Otherwise the live indices are left alone.
+
+    The outbox isn't pushed meanwhile, its updates of the live indices would be lost by the move.
+    The temporary indices that weren't moved into place are deleted, also when a build fails.
+    """
+    tmp_index_names = {
+        _get_tmp_index_name(algolia_engine.get_adapter(model).index_name)
+        for model in INDEXED_MODELS
+    }
+    with _hold_pushes():
+        try:
+            with ThreadPoolExecutor(len(INDEXED_MODELS)) as executor:
+                results = list(executor.map(_build_tmp_index, INDEXED_MODELS))
+
+            if all(result.is_valid() for result in results):
+                for result in results:
+                    tmp_index_name = _get_tmp_index_name(result.index_name)
+                    algolia_engine.client.move_index(tmp_index_name, result.index_name).wait()
+                    tmp_index_names.remove(tmp_index_name)
+        finally:
+            for tmp_index_name in tmp_index_names:
+                try:
+                    algolia_engine.client.init_index(tmp_index_name).delete()
+                except Exception as err:
+                    # don't hide the error of the build
+                    capture_exception(err)
+    return results
+
+
+def _build_tmp_index(model: type[Model]) -> ReindexResult:
+    adapter = algolia_engine.get_adapter(model)
+    tmp_index_name = _get_tmp_index_name(adapter.index_name)
+    tmp_index = algolia_engine.client.init_index(tmp_index_name)
+    try:
+        if algolia_engine.client.init_index(adapter.index_name).exists():
+            algolia_engine.client.copy_index(
+                adapter.index_name,
+                tmp_index_name,
+                {"scope": ["settings", "synonyms", "rules"]},
+            ).wait()
+        tmp_index.clear_objects().wait()
+
+        if hasattr(adapter, "get_queryset"):
+            queryset = adapter.get_queryset()
+        else:
+            queryset = model.objects.all()
+        records = (
+            adapter.get_raw_record(instance)
+            for instance in queryset
+            if adapter._should_index(instance)
+        )
+        count = 0
+        for batch in batched(records, PUSH_BATCH_SIZE):
+            tmp_index.save_objects(batch).wait()
+            count += len(batch)
+        print(f"built {tmp_index_name} with {count} records")
+
+        count_indexed = tmp_index.search("", {"hitsPerPage": 0})["nbHits"]
+        return ReindexResult(adapter.index_name, count, count_indexed)
+    finally:
+        # each thread has its own connection
+        connection.close()
+
+
+def _get_tmp_index_name(index_name: str) -> str:
+    return f"{index_name}_tmp"
+
+
+@contextmanager
+def _try_lock_pushes():
+    # a session lock rather than a transaction one, so no transaction stays open meanwhile
+    if connection.vendor != "postgresql":
+        yield True  # eg SQLite in the docker builder, which has no concurrent workers
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [PUSH_LOCK_KEY])
+        is_locked = cursor.fetchone()[0]
+    try:
+        yield is_locked
+    finally:
+        if is_locked:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [PUSH_LOCK_KEY])
+
+
+@contextmanager
+def _hold_pushes():
+    # blocks `push_index_events` in the other workers, waiting for the one running
+    if connection.vendor != "postgresql":
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", [PUSH_LOCK_KEY])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [PUSH_LOCK_KEY])
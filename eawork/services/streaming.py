@@ -0,0 +1,69 @@
+import queue
+import threading
+import weakref
+from itertools import islice
+from typing import Iterable
+from typing import Iterator
+from typing import TypeVar
+
+
+T = TypeVar("T")
+
+PREFETCH_SIZE = 1000
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def prefetch(items: Iterable[T], size: int = PREFETCH_SIZE) -> Iterator[T]:
+    """
+    Iterates `items` in a background thread, up to `size` items ahead of the consumer, e.g. so
+    the next airtable pages are fetched while the current ones are written to the DB.
+
+    The thread starts right away, so several streams fetch at the same time even when they are
+    consumed one after the other, and stops when the consumer closes or drops the iterator.
+    Errors of the producer are raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize=size)
+    is_closed = threading.Event()
+    end = object()
+
+    def put(item) -> bool:
+        while not is_closed.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except BaseException as err:
+            put((end, err))
+
+    def consume() -> Iterator[T]:
+        try:
+            while True:
+                item, err = buffer.get()
+                if err is not None:
+                    raise err
+                if item is end:
+                    return
+                yield item
+        finally:
+            is_closed.set()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    consumer = consume()
+    # an iterator that is never started doesn't run its `finally`
+    weakref.finalize(consumer, is_closed.set)
+    return consumer
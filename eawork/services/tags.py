@@ -0,0 +1,271 @@
+from collections import Counter
+from contextlib import ContextDecorator
+from contextlib import contextmanager
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+
+from eawork.models import JobPost
+from eawork.models import JobPostTag
+from eawork.models import JobPostTagType
+from eawork.models import JobPostTagTypeEnum
+from eawork.models import JobPostVersion
+from eawork.models import PostJobTagStatus
+from eawork.services.bulk import BULK_BATCH_SIZE
+from eawork.services.bulk import bulk_create_with_pks
+from eawork.services.search_index import enqueue_index_events
+
+
+# the fields counted in JobPostTag.job_count, tags_area_filter only mirrors tags_area
+TAG_COUNT_FIELDS = [f"tags_{enum_member.value}" for enum_member in JobPostTagTypeEnum]
+
+# M2M field name -> names of the tags that should be attached through it
+TagNames = dict[str, list[str]]
+
+
+class TagRegistry:
+    """
+    Per-import cache of all tags and tag types.
+
+    Tags are looked up case-insensitively, like `name__iexact` did before. Missing tags and
+    tag <-> type links are only collected by `add` and written in bulk by `flush`.
+    """
+
+    def __init__(self):
+        self.tag_types: dict[JobPostTagTypeEnum, JobPostTagType] = {
+            tag_type.type: tag_type for tag_type in JobPostTagType.objects.all()
+        }
+        self.tags: dict[str, JobPostTag] = {}
+        for tag in JobPostTag.objects.order_by("pk"):
+            self.tags.setdefault(_to_key(tag.name), tag)
+
+        self._type_links: set[tuple[int, int]] = set(
+            JobPostTag.types.through.objects.values_list("jobposttag_id", "jobposttagtype_id")
+        )
+        self._tags_new: dict[str, JobPostTag] = {}
+        self._type_links_pending: set[tuple[str, JobPostTagTypeEnum]] = set()
+
+    def add(self, name: str, tag_type: JobPostTagTypeEnum):
+        key = _to_key(name)
+        if key not in self.tags and key not in self._tags_new:
+            self._tags_new[key] = JobPostTag(name=name, status=PostJobTagStatus.APPROVED)
+        self._type_links_pending.add((key, tag_type))
+
+    def get(self, name: str) -> JobPostTag | None:
+        return self.tags.get(_to_key(name))
+
+    @contextmanager
+    def atomic(self):
+        """
+        `transaction.atomic` that also forgets the tags and type links flushed in it if it rolls
+        back, so a later flush or lookup doesn't use the pks of rows that were never committed.
+        """
+        tags = dict(self.tags)
+        type_links = set(self._type_links)
+        try:
+            with transaction.atomic():
+                yield
+        except BaseException:
+            self.tags = tags
+            self._type_links = type_links
+            self._tags_new = {}
+            self._type_links_pending = set()
+            raise
+
+    # returns the pks of the tags that were created or got a new type
+    def flush(self) -> set[int]:
+        # the new names are unique, `add` only creates a tag for a name it doesn't know yet
+        bulk_create_with_pks(
+            JobPostTag, list(self._tags_new.values()), "name", batch_size=BULK_BATCH_SIZE
+        )
+        self.tags.update(self._tags_new)
+        tags_changed = {tag.pk for tag in self._tags_new.values()}
+        self._tags_new = {}
+
+        links_new = []
+        for key, tag_type in self._type_links_pending:
+            link = (self.tags[key].pk, self.tag_types[tag_type].pk)
+            if link not in self._type_links:
+                self._type_links.add(link)
+                tags_changed.add(link[0])
+                links_new.append(
+                    JobPostTag.types.through(jobposttag_id=link[0], jobposttagtype_id=link[1])
+                )
+        JobPostTag.types.through.objects.bulk_create(links_new, batch_size=BULK_BATCH_SIZE)
+        self._type_links_pending = set()
+        return tags_changed
+
+
+def _to_key(name: str) -> str:
+    return name.casefold()
+
+
+def sync_tags(
+    model, fields: list[str], tag_names_by_pk: dict[int, TagNames], registry: TagRegistry
+) -> set[int]:
+    """
+    Brings the given tag M2M fields of all `tag_names_by_pk` instances in line with the wanted
+    tag names. The current through-table rows are fetched in one query per field, and only
+    the missing rows are inserted and the stale ones deleted.
+
+    Must be called after `registry.flush()`, when every wanted tag exists. Returns the pks of
+    the tags that were attached or detached.
+    """
+    pks = list(tag_names_by_pk)
+    tags_changed: set[int] = set()
+    for field_name in fields:
+        field = model._meta.get_field(field_name)
+        through = field.remote_field.through
+        source_attname = f"{field.m2m_field_name()}_id"
+        target_attname = f"{field.m2m_reverse_field_name()}_id"
+
+        rows_current: dict[tuple[int, int], int] = {
+            (source_pk, tag_pk): row_pk
+            for row_pk, source_pk, tag_pk in through.objects.filter(
+                **{f"{source_attname}__in": pks}
+            ).values_list("pk", source_attname, target_attname)
+        }
+        rows_wanted: set[tuple[int, int]] = {
+            (source_pk, registry.get(tag_name).pk)
+            for source_pk, tag_names in tag_names_by_pk.items()
+            for tag_name in tag_names.get(field_name, [])
+        }
+
+        rows_stale = {
+            row: row_pk for row, row_pk in rows_current.items() if row not in rows_wanted
+        }
+        if rows_stale:
+            through.objects.filter(pk__in=rows_stale.values()).delete()
+        rows_new = rows_wanted - rows_current.keys()
+        through.objects.bulk_create(
+            [
+                through(**{source_attname: source_pk, target_attname: tag_pk})
+                for source_pk, tag_pk in rows_new
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        tags_changed.update(tag_pk for _, tag_pk in rows_stale.keys() | rows_new)
+
+    return tags_changed
+
+
+def refresh_tag_counts(tag_pks: Iterable[int] = None) -> set[int]:
+    """
+    Recomputes `JobPostTag.job_count` of the given tags, or of all of them, with one grouped
+    query across the tag tables of the current versions. Returns the pks of the changed tags.
+    """
+    tag_pks = None if tag_pks is None else list(tag_pks)
+    querysets = []
+    for field_name in TAG_COUNT_FIELDS:
+        if tag_pks is None:
+            lookups = {f"version_current__{field_name}__isnull": False}
+        else:
+            lookups = {f"version_current__{field_name}__in": tag_pks}
+        querysets.append(
+            JobPost.objects.filter(**lookups)
+            .values_list(f"version_current__{field_name}")
+            .annotate(count=Count("pk"))
+            .order_by()
+        )
+    counts: Counter[int] = Counter()
+    for tag_pk, count in querysets[0].union(*querysets[1:], all=True):
+        counts[tag_pk] += count
+
+    tags = JobPostTag.objects.only("job_count")
+    if tag_pks is not None:
+        tags = tags.filter(pk__in=tag_pks)
+    tags_changed = [tag for tag in tags if tag.job_count != counts[tag.pk]]
+    for tag in tags_changed:
+        tag.job_count = counts[tag.pk]
+    JobPostTag.objects.bulk_update(
+        tags_changed, fields=["job_count"], batch_size=BULK_BATCH_SIZE
+    )
+    return {tag.pk for tag in tags_changed}
+
+
+def _on_tags_change(sender, instance, action: str, reverse: bool, pk_set: set[int], **kwargs):
+    if reverse:
+        # eg `tag.tags_area.add(version)`, only the counts of that tag change
+        if action in ["post_add", "post_remove", "post_clear"]:
+            _refresh_counts_on_commit([instance.pk])
+    elif action in ["post_add", "post_remove"]:
+        _refresh_counts_on_commit(pk_set)
+    elif action == "pre_clear":
+        # a clear doesn't tell which tags it removes, they are read before
+        _refresh_counts_on_commit(
+            sender.objects.filter(jobpostversion=instance).values_list(
+                "jobposttag_id", flat=True
+            )
+        )
+
+
+def _on_post_save(sender, instance: JobPost, **kwargs):
+    # a new version_current, whose tags replace the ones of the previous one in the counts
+    version_pks = {instance.version_current_id, instance._version_current_id_saved}
+    if len(version_pks) > 1:
+        _refresh_counts_on_commit(_get_tag_pks(version_pks - {None}))
+
+
+def _on_post_pre_delete(sender, instance: JobPost, **kwargs):
+    # before the cascade deletes the version and its tag rows
+    if instance.version_current_id:
+        _refresh_counts_on_commit(_get_tag_pks([instance.version_current_id]))
+
+
+def _get_tag_pks(version_pks: Iterable[int]) -> set[int]:
+    version_pks = list(version_pks)
+    if not version_pks:
+        return set()
+    querysets = [
+        getattr(JobPostVersion, field_name)
+        .through.objects.filter(jobpostversion__in=version_pks)
+        .values_list("jobposttag_id", flat=True)
+        for field_name in TAG_COUNT_FIELDS
+    ]
+    return set(querysets[0].union(*querysets[1:], all=True))
+
+
+def _refresh_counts_on_commit(tag_pks: Iterable[int]):
+    tag_pks = set(tag_pks)
+    if tag_pks:
+        transaction.on_commit(
+            lambda: enqueue_index_events(JobPostTag, refresh_tag_counts(tag_pks))
+        )
+
+
+def connect_tag_count_events():
+    """
+    Keeps the counts up to date on admin and API edits. The import writes in bulk without
+    signals and refreshes all the counts itself, which also catches up on deleted posts.
+    """
+    for field_name in TAG_COUNT_FIELDS:
+        m2m_changed.connect(
+            _on_tags_change,
+            sender=getattr(JobPostVersion, field_name).through,
+            dispatch_uid="tag_count",
+        )
+    post_save.connect(_on_post_save, sender=JobPost, dispatch_uid="tag_count")
+    pre_delete.connect(_on_post_pre_delete, sender=JobPost, dispatch_uid="tag_count")
+
+
+class disable_tag_count_events(ContextDecorator):
+    """
+    For bulk writes that refresh the counts themselves, eg the import, whose removal of the
+    posts would otherwise look up the tags of every deleted post.
+    """
+
+    def __enter__(self):
+        self.is_connected = pre_delete.disconnect(sender=JobPost, dispatch_uid="tag_count")
+        post_save.disconnect(sender=JobPost, dispatch_uid="tag_count")
+        for field_name in TAG_COUNT_FIELDS:
+            m2m_changed.disconnect(
+                sender=getattr(JobPostVersion, field_name).through, dispatch_uid="tag_count"
+            )
+
+    def __exit__(self, *exc_info):
+        if self.is_connected:
+            connect_tag_count_events()
@@ -297,6 +297,8 @@ ADMIN_REORDER = [
         "models": [
             "sites.Site",
             "auditlog.LogEntry",
+            "eawork.ImportState",
+            "eawork.SearchIndexEvent",
             "socialaccount.SocialApp",
         ],
     },
@@ -335,6 +337,17 @@ ALGOLIA = {
         default="tags_prod",
     ),
     "INDEX_NAME_COMPANIES": env.str("ALGOLIA_INDEX_NAME_COMPANIES", default="companies_prod"),
+    # see eawork.services.search_index
+    "AUTO_INDEXING": False,
+}
+
+# "algolia", or "local" for an in-process index of the jobs, see eawork.services.search_backend
+SEARCH_BACKEND = env.str("SEARCH_BACKEND", default="algolia")
+
+JOB_ALERTS = {
+    # the alerts are rendered and sent in chunks, on this many threads
+    "CONCURRENCY": env.int("JOB_ALERTS_CONCURRENCY", 8),
+    "CHUNK_SIZE": env.int("JOB_ALERTS_CHUNK_SIZE", 100),
 }
 
 MAILCHIMP = {
@@ -347,4 +360,28 @@ MAILCHIMP = {
 AIRTABLE = {
     "API_KEY": env.str("AIRTABLE_API_KEY", ""),
     "BASE_ID": env.str("AIRTABLE_BASE_ID", ""),
+    # "api", or for offline tests and benchmarks "recorded" or "synthetic"
+    "SOURCE": env.str("AIRTABLE_SOURCE", "api"),
+    "FIXTURES_DIR": env.str(
+        "AIRTABLE_FIXTURES_DIR", os.path.join(BASE_DIR, "eawork/tests/fixtures/airtable")
+    ),
+    "SYNTHETIC_VACANCIES": env.int("AIRTABLE_SYNTHETIC_VACANCIES", 1000),
+    "SYNTHETIC_ORGS": env.int("AIRTABLE_SYNTHETIC_ORGS", 300),
+    "SYNTHETIC_SEED": env.int("AIRTABLE_SYNTHETIC_SEED", 0),
+}
+
+CELERY_BEAT_SCHEDULE = {
+    # picks up the search index events whose push failed or was never scheduled
+    "push-search-index-events": {
+        "task": "eawork.tasks.push_search_index_events",
+        "schedule": 60,
+    },
+    "sweep-expired-jobs": {
+        "task": "eawork.tasks.sweep_expired_jobs",
+        "schedule": 15 * 60,
+    },
+    "check-algolia-parity": {
+        "task": "eawork.tasks.check_algolia_parity",
+        "schedule": 60 * 60,
+    },
 }
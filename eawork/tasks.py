@@ -2,15 +2,23 @@ from celery import shared_task, chain
 from celery.utils.log import get_task_logger
 
 import requests
-from algoliasearch_django import reindex_all, raw_search
-from algoliasearch_django.decorators import disable_auto_indexing
+from algoliasearch_django import reindex_all
 from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
 from eawork.apps.job_alerts.job_alert import check_new_jobs_for_all_alerts
 
-from eawork.models import JobPostVersion, JobPostTag, Company
+from eawork.models import JobPostVersion, JobPostTag, Company, ImportState
 from eawork.services.email_log import Code, Task, email_log
 from eawork.services.import_80_000_hours import import_companies, import_jobs, refine_tags
 from eawork.services.airtable import import_from_airtable
+from eawork.services.companies import refresh_company_projections
+from eawork.services.index_parity import check_index_parity
+from eawork.services.search_index import disable_index_events, push_index_events
+from eawork.services.search_index import delete_expired_jobs, reindex_blue_green
+from eawork.services.tags import TagRegistry
+from eawork.services.tags import disable_tag_count_events
+from eawork.services.tags import refresh_tag_counts
 
 logger = get_task_logger(__name__)
 
@@ -25,31 +33,50 @@ def add(x, y):
 def import_80_000_hours_jobs(
     json_to_import: dict = None,
     limit: int = None,
-    is_reindex: bool = True,
+    is_reindex: bool = False,
     is_companies_only: bool = False,
     is_jobs_only: bool = False,
+    is_incremental: bool = False,
 ):
+    """
+    By default only the Algolia records of the rows changed by the import are pushed, through the
+    outbox, a full reindex of all three indices only runs with `is_reindex` (or from the admin).
+    """
     print("import 80K")
     data_raw = {}
-    with disable_auto_indexing():
+    import_state = ImportState.get_solo()
+    # airtable's LAST_MODIFIED_TIME() is only precise to the second, let the syncs overlap a bit
+    fetched_at = timezone.now() - timedelta(minutes=5)
+    # the import steps enqueue their own changes and refresh the tag counts themselves
+    with disable_index_events(), disable_tag_count_events():
         if json_to_import:
             data_raw = json_to_import["data"]
         else:
             # resp = requests.get(url="https://api.80000hours.org/job-board/vacancies")
             # data_raw = resp.json()["data"]
-            data_raw = import_from_airtable()["data"]
+            modified_since = import_state.airtable_synced_at if is_incremental else None
+            data_raw = import_from_airtable(modified_since=modified_since)["data"]
+        # shared by all the import steps, so tags are only loaded once per sync
+        registry = TagRegistry()
         if is_companies_only:
-            import_companies(data_raw)
-            
+            import_companies(data_raw, registry=registry)
+
         elif is_jobs_only:
-            import_jobs(data_raw, limit=limit)
+            import_jobs(data_raw, limit=limit, registry=registry)
         else:
-            import_companies(data_raw)
-            import_jobs(data_raw, limit=limit)
-
-        refine_tags(data_raw["problem_area_tags"])
-    if is_reindex and settings.IS_ENABLE_ALGOLIA:
-        reindex_algolia()
+            import_companies(data_raw, registry=registry)
+            stats = import_jobs(data_raw, limit=limit, registry=registry)
+            if stats is not None and not json_to_import and not limit:
+                import_state.airtable_synced_at = fetched_at
+                # the sweep saves the other watermark of the singleton meanwhile
+                import_state.save(update_fields=["airtable_synced_at"])
+
+        refine_tags(data_raw["problem_area_tags"], registry=registry)
+    if settings.IS_ENABLE_ALGOLIA:
+        if is_reindex:
+            reindex_algolia()
+        else:
+            push_search_index_events()
 
 
 @shared_task
@@ -62,7 +89,7 @@ def old_import_80_000_hours_jobs(
 ):
     print("import 80K")
     data_raw = {}
-    with disable_auto_indexing():
+    with disable_index_events():
         if json_to_import:
             data_raw = json_to_import["data"]
         else:
@@ -82,30 +109,73 @@ def old_import_80_000_hours_jobs(
 
 # ALGOLIA
 @shared_task
-def reindex_algolia():
-    count = JobPostVersion.objects.all().count()
+def push_search_index_events():
+    # also scheduled periodically, for the events whose push failed or was never scheduled
+    while push_index_events():
+        pass
+
+
+@shared_task
+def sweep_expired_jobs():
+    # scheduled, eligibility is otherwise only checked when a job is pushed or reindexed
+    if not settings.IS_ENABLE_ALGOLIA:
+        return
+    import_state = ImportState.get_solo()
+    now = timezone.now()
+    count = delete_expired_jobs(import_state.jobs_expired_until, now)
+    print(f"deleted {count} expired jobs from algolia")
+    import_state.jobs_expired_until = now
+    import_state.save(update_fields=["jobs_expired_until"])
+
+
+@shared_task
+def reindex_algolia(is_blue_green: bool = True):
+    """
+    `is_blue_green` builds all the indices before swapping any of them, so the front end never
+    sees e.g. the jobs of a new import next to the companies of the previous one.
+    """
     print("reindex algolia")
+    refresh_tag_counts()
+    refresh_company_projections(Company.objects.values_list("pk", flat=True))
+
+    if is_blue_green:
+        results = reindex_blue_green()
+        print("\n".join(str(result) for result in results))
+        if not all(result.is_valid() for result in results):
+            email_log(
+                Task.INDEX_PARITY_CHECK,
+                Code.FAILURE,
+                content="The live indices were kept, the rebuilt ones were incomplete:\n"
+                + "\n".join(str(result) for result in results),
+            )
+            return
+        # the updates held back during the rebuild
+        push_search_index_events()
+    else:
+        reindex_all(JobPostVersion)
+        reindex_all(JobPostTag)
+        reindex_all(Company)
 
-    reindex_all(JobPostVersion)
-    reindex_all(JobPostTag)
-    reindex_all(Company)
+    reports = check_index_parity()
+    email_log(
+        Task.INDEX_PARITY_CHECK,
+        Code.SUCCESS if all(report.is_ok() for report in reports) else Code.FAILURE,
+        content="\n".join(str(report) for report in reports),
+    )
 
-    res = raw_search(JobPostVersion)
-    hits = res.get("nbHits")
 
-    successRatio = hits / count
-    # they usually won't line up due to closing dates, so only alert if there's a significant difference
-    if successRatio < 0.9:
+@shared_task
+def check_algolia_parity(is_repair: bool = True):
+    # scheduled hourly, so only the mismatches are emailed
+    if not settings.IS_ENABLE_ALGOLIA:
+        return
+    reports = check_index_parity(is_repair=is_repair)
+    if not all(report.is_ok() for report in reports):
         email_log(
             Task.INDEX_PARITY_CHECK,
             Code.FAILURE,
-            content=f"We have {count} job post version in the DB, but Algolia only indexed {hits}",
-        )
-    else:
-        email_log(
-            Task.INDEX_PARITY_CHECK,
-            Code.SUCCESS,
-            content=f"Algolia indexed {hits} and we have {count} job post versions in our DB.",
+            content=("The records were enqueued for a repair:\n" if is_repair else "")
+            + "\n".join(str(report) for report in reports),
         )
 
 
@@ -1,6 +1,11 @@
+from django.conf import settings
+from django.test import override_settings
 from faker import Faker
 from rest_framework.test import APITestCase
 
+from eawork.models import JobPostTagType
+from eawork.models import JobPostTagTypeEnum
+
 
 class Gen:
     def __init__(self):
@@ -12,3 +17,30 @@ class EAWorkTestCase(APITestCase):
     def setUpClass(cls):
         cls.gen = Gen()
         super().setUpClass()
+
+
+class SyntheticImportTestCase(EAWorkTestCase):
+    """Imports `synthetic_vacancies` synthetic airtable vacancies once for the whole class."""
+
+    synthetic_vacancies = 100
+
+    @classmethod
+    def setUpTestData(cls):
+        from eawork.tasks import import_80_000_hours_jobs
+
+        create_tag_types()
+        with override_synthetic_airtable(vacancies=cls.synthetic_vacancies):
+            import_80_000_hours_jobs()
+
+
+def create_tag_types():
+    # the import expects every tag type to exist, like the data migrations leave it
+    for tag_type in JobPostTagTypeEnum:
+        JobPostTagType.objects.get_or_create(type=tag_type)
+
+
+def override_synthetic_airtable(vacancies: int, orgs: int = None) -> override_settings:
+    airtable = {**settings.AIRTABLE, "SOURCE": "synthetic", "SYNTHETIC_VACANCIES": vacancies}
+    if orgs is not None:
+        airtable["SYNTHETIC_ORGS"] = orgs
+    return override_settings(AIRTABLE=airtable)
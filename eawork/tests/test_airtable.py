@@ -0,0 +1,105 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from unittest import mock
+
+from django.utils import timezone as django_timezone
+
+from eawork.models import ImportState
+from eawork.services.airtable import VACANCIES_LIVE_FORMULA
+from eawork.services.airtable import ParsedLocation
+from eawork.services.airtable import get_organisation_params
+from eawork.services.airtable import get_vacancy_params
+from eawork.services.airtable import import_from_airtable
+from eawork.services.airtable import iter_airtable_pages
+from eawork.services.airtable import parse_locations
+from eawork.tasks import import_80_000_hours_jobs
+from eawork.tests.cases import EAWorkTestCase
+from eawork.tests.cases import SyntheticImportTestCase
+from eawork.tests.cases import override_synthetic_airtable
+
+
+class ModifiedSinceParamsTest(EAWorkTestCase):
+    since = datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=2)))
+    since_formula = "DATETIME_PARSE('2023-01-02T01:04:05.000Z')"  # in UTC
+
+    def test_full_fetch_has_no_modified_filter(self):
+        self.assertEqual(get_vacancy_params()["filterByFormula"], VACANCIES_LIVE_FORMULA)
+        self.assertNotIn("filterByFormula", get_organisation_params())
+
+    def test_vacancies_modified_or_published_since(self):
+        self.assertEqual(
+            get_vacancy_params(self.since)["filterByFormula"],
+            f"AND( {VACANCIES_LIVE_FORMULA}, OR( "
+            f"IS_AFTER(LAST_MODIFIED_TIME(), {self.since_formula}), "
+            f"IS_AFTER({{!Date published}}, {self.since_formula}) ) )",
+        )
+
+    def test_organisations_modified_since(self):
+        self.assertEqual(
+            get_organisation_params(self.since)["filterByFormula"],
+            f"IS_AFTER(LAST_MODIFIED_TIME(), {self.since_formula})",
+        )
+
+
+class ParseLocationsTest(EAWorkTestCase):
+    def test_city_and_country_as_displayed(self):
+        names = [
+            "London.UK",
+            "Washington, DC.USA",
+            "Remote.Global",
+            "Remote.USA",
+            "Remote.Remote",
+            "Various countries.Various countries",
+            ".UK",
+            "Unparsable",
+        ]
+        locations = parse_locations({f"rec{index}": name for index, name in enumerate(names)})
+        self.assertEqual(
+            locations,
+            {
+                "rec0": ParsedLocation("London", "UK", "London, UK"),
+                "rec1": ParsedLocation("Washington, DC", "USA", "Washington, DC"),
+                "rec2": ParsedLocation("Remote", "Global", "Remote, Global"),
+                "rec3": ParsedLocation("Remote", "USA", "Remote, USA"),
+                "rec4": ParsedLocation("Remote", "Remote", "Remote"),
+                "rec5": ParsedLocation(
+                    "Various countries", "Various countries", "Various countries"
+                ),
+                "rec6": ParsedLocation("", "UK", ", UK"),
+            },
+        )
+
+
+class OfflineSourceTest(EAWorkTestCase):
+    def test_synthetic_size_is_not_capped_by_max_records(self):
+        params = {"fields": ["!Title"], "max_records": 5}
+        with override_synthetic_airtable(vacancies=12):
+            pages = list(iter_airtable_pages("!Vacancies", params))
+        self.assertEqual(sum(len(page) for page in pages), 12)
+        self.assertEqual(set(pages[0][0]["fields"]), {"!Title"})
+
+
+class IncrementalSyncTest(SyntheticImportTestCase):
+    synthetic_vacancies = 20
+
+    def test_watermark_is_passed_and_advanced(self):
+        synced_at = ImportState.get_solo().airtable_synced_at
+        self.assertIsNotNone(synced_at)
+
+        with override_synthetic_airtable(vacancies=self.synthetic_vacancies), mock.patch(
+            "eawork.tasks.import_from_airtable", wraps=import_from_airtable
+        ) as import_mock:
+            import_80_000_hours_jobs(is_incremental=True)
+
+        import_mock.assert_called_once_with(modified_since=synced_at)
+        synced_at_new = ImportState.get_solo().airtable_synced_at
+        # behind the fetch, so the next sync overlaps this one
+        self.assertGreater(synced_at_new, synced_at)
+        self.assertLess(synced_at_new, django_timezone.now() - timedelta(minutes=4))
+
+    def test_partial_import_keeps_the_watermark(self):
+        synced_at = ImportState.get_solo().airtable_synced_at
+        with override_synthetic_airtable(vacancies=self.synthetic_vacancies):
+            import_80_000_hours_jobs(limit=5, is_incremental=True)
+        self.assertEqual(ImportState.get_solo().airtable_synced_at, synced_at)
@@ -0,0 +1,98 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from eawork.services.airtable import AIRTABLE_REQUESTS_PER_SECOND
+from eawork.services.airtable import RateLimitedTable
+from eawork.services.airtable import _rate_limiters
+from eawork.services.airtable_utils.rate_limiter import RateLimiter
+
+
+class RateLimiterTest(SimpleTestCase):
+    @mock.patch("eawork.services.airtable_utils.rate_limiter.time")
+    def test_spaces_the_calls_of_all_threads(self, time_mock):
+        time_mock.monotonic.return_value = 100.0  # every thread calls at the same moment
+        limiter = RateLimiter(AIRTABLE_REQUESTS_PER_SECOND)
+
+        threads = [threading.Thread(target=limiter.wait) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # the first call goes right away, each next one 1/5 s after the previous
+        waits = sorted(call.args[0] for call in time_mock.sleep.call_args_list)
+        self.assertEqual(len(waits), 9)
+        for number, wait in enumerate(waits, start=1):
+            self.assertAlmostEqual(wait, number * 0.2)
+
+    @mock.patch("eawork.services.airtable_utils.rate_limiter.time")
+    def test_no_wait_once_the_interval_passed(self, time_mock):
+        limiter = RateLimiter(AIRTABLE_REQUESTS_PER_SECOND)
+        for now in [100.0, 100.25, 101.0]:
+            time_mock.monotonic.return_value = now
+            limiter.wait()
+        time_mock.sleep.assert_not_called()
+
+
+class AirtableStub(BaseHTTPRequestHandler):
+    """Answers 429 to the first `rate_limited` requests, then one page of records."""
+
+    rate_limited = 0
+    paths: list[str] = []
+
+    def do_GET(self):
+        AirtableStub.paths.append(self.path)
+        if AirtableStub.rate_limited:
+            AirtableStub.rate_limited -= 1
+            self.send_response(429)
+            self.end_headers()
+            return
+        body = json.dumps({"records": [{"id": "rec1", "fields": {}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RateLimitedTableTest(SimpleTestCase):
+    def setUp(self):
+        AirtableStub.paths = []
+        server = ThreadingHTTPServer(("127.0.0.1", 0), AirtableStub)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        patcher = mock.patch.object(
+            RateLimitedTable, "API_URL", f"http://127.0.0.1:{server.server_port}/v0"
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # the backoff between the retries
+        patcher = mock.patch("urllib3.util.retry.time.sleep")
+        self.sleep_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_after_a_429(self):
+        AirtableStub.rate_limited = 2
+        table = RateLimitedTable("key", "appRetry", "!Vacancies")
+
+        self.assertEqual(list(table.iterate()), [[{"id": "rec1", "fields": {}}]])
+        self.assertEqual(len(AirtableStub.paths), 3)
+        # urllib3 retries the first time right away, then backs off by `backoff_factor`
+        self.sleep_mock.assert_called_once_with(4)
+
+    def test_tables_of_a_base_share_the_limiter(self):
+        tables = [RateLimitedTable("key", "appShared", name) for name in ["!Orgs", "!Vacancies"]]
+        table_other_base = RateLimitedTable("key", "appOther", "!Orgs")
+
+        self.assertIs(tables[0].rate_limiter, tables[1].rate_limiter)
+        self.assertIs(tables[0].rate_limiter, _rate_limiters["appShared"])
+        self.assertIsNot(tables[0].rate_limiter, table_other_base.rate_limiter)
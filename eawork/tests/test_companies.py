@@ -0,0 +1,100 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from django.utils import timezone as django_timezone
+
+from eawork.models import Company
+from eawork.models import JobPost
+from eawork.models import JobPostTag
+from eawork.models import JobPostVersion
+from eawork.services.companies import refresh_company_projections
+from eawork.tests.cases import EAWorkTestCase
+
+
+class CompanyProjectionTest(EAWorkTestCase):
+    closes_at = datetime(2030, 1, 2, tzinfo=timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = {
+            name: JobPostTag.objects.create(name=name)
+            for name in ["London.UK", "Remote.Global", "AI safety", "Biosecurity", "Senior"]
+        }
+        cls.company = Company.objects.create(name="Company", headquarters=tags["London.UK"])
+        cls.company.tags_locations.set([tags["London.UK"], tags["Remote.Global"]])
+        cls.company.tags_areas.set([tags["AI safety"]])
+        cls.company_empty = Company.objects.create(name="Company")
+
+        cls.post = cls.create_post(cls.company, title="Old title")
+        cls.version = JobPostVersion.objects.create(
+            post=cls.post,
+            title="Title",
+            salary="£50k",
+            visa_sponsorship="Yes",
+            closes_at=cls.closes_at,
+        )
+        cls.version.tags_area.set([tags["AI safety"], tags["Biosecurity"]])
+        cls.version.tags_exp_required.set([tags["Senior"]])
+        cls.post.version_current = cls.version
+        cls.post.save()
+
+        cls.post_evergreen = cls.create_post(cls.company, title="Evergreen")
+        # the same name, but another company
+        cls.create_post(Company.objects.create(name="Company"), title="Other")
+
+    @classmethod
+    def create_post(cls, company: Company, title: str) -> JobPost:
+        post = JobPost.objects.create(company=company)
+        post.version_current = JobPostVersion.objects.create(post=post, title=title)
+        post.save()
+        return post
+
+    def test_projection_of_the_current_versions(self):
+        with self.assertNumQueries(7):
+            refresh_company_projections([self.company.pk, self.company_empty.pk])
+
+        self.company.refresh_from_db()
+        self.assertEqual(
+            self.company.search_projection,
+            {
+                "posts": [
+                    {
+                        "pk": self.version.pk,
+                        "title": "Title",
+                        "salary": "£50k",
+                        "visa_sponsorship": "Yes",
+                        "problem_areas": ["AI safety", "Biosecurity"],
+                        "experience_required": ["Senior"],
+                        "closes_at": self.closes_at.isoformat(),
+                    },
+                    {
+                        "pk": self.post_evergreen.version_current.pk,
+                        "title": "Evergreen",
+                        "salary": "",
+                        "visa_sponsorship": "",
+                        "problem_areas": [],
+                        "experience_required": [],
+                        "closes_at": None,
+                    },
+                ],
+                "locations": ["London, UK", "Remote, Global"],
+                "problem_areas": ["AI safety"],
+                "hq": "London.UK",
+            },
+        )
+        self.company_empty.refresh_from_db()
+        self.assertEqual(
+            self.company_empty.search_projection,
+            {"posts": [], "locations": [], "problem_areas": [], "hq": ""},
+        )
+
+    def test_closed_post_is_dropped_from_the_record(self):
+        JobPostVersion.objects.filter(pk=self.version.pk).update(
+            closes_at=django_timezone.now() - timedelta(days=2)
+        )
+        refresh_company_projections([self.company.pk])
+
+        self.company.refresh_from_db()
+        self.assertEqual(len(self.company.search_projection["posts"]), 2)
+        self.assertEqual([post["title"] for post in self.company.get_posts()], ["Evergreen"])
@@ -0,0 +1,208 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from eawork.models import Company
+from eawork.models import JobPost
+from eawork.models import JobPostTag
+from eawork.models import JobPostTagTypeEnum
+from eawork.models import JobPostVersion
+from eawork.models import PostStatus
+from eawork.services.airtable import import_from_airtable
+from eawork.services.import_80_000_hours import _get_city_tags
+from eawork.services.import_80_000_hours import _get_country_tags
+from eawork.services.import_80_000_hours import import_companies
+from eawork.services.import_80_000_hours import import_jobs
+from eawork.services.import_80_000_hours import refine_tags
+from eawork.services.search_index import IndexChanges
+from eawork.tests.cases import SyntheticImportTestCase
+from eawork.tests.cases import override_synthetic_airtable
+
+
+CITY = JobPostTagTypeEnum.CITY
+COUNTRY = JobPostTagTypeEnum.COUNTRY
+LOCATION_80K = JobPostTagTypeEnum.LOCATION_80K
+LOCATION_TYPE = JobPostTagTypeEnum.LOCATION_TYPE
+
+
+class LocationTagsTest(SimpleTestCase):
+    def test_city_tags(self):
+        cases = {
+            "": [],
+            "Boston": [("Boston", CITY), ("Boston", LOCATION_80K)],
+            "Washington, DC": [("Washington, DC", CITY), ("Washington, DC", LOCATION_80K)],
+            "Various countries": [
+                ("Various countries", CITY),
+                ("Various countries", LOCATION_80K),
+            ],
+            "Remote": [("Remote", LOCATION_TYPE), ("Remote", LOCATION_80K)],
+            "Remote, USA": [("Remote", LOCATION_TYPE), ("Remote, USA", LOCATION_80K)],
+            # the api-builder oddities
+            "UK,": [("UK", COUNTRY), ("UK,", LOCATION_80K)],
+            ", UK": [(", UK", LOCATION_80K)],
+        }
+        for city, tags in cases.items():
+            with self.subTest(city=city):
+                self.assertEqual(list(_get_city_tags(city)), tags)
+
+    def test_country_tags(self):
+        cases = {
+            "": [],
+            "USA": [("USA", COUNTRY), ("USA", LOCATION_80K)],
+            "Various countries": [
+                ("Various countries", COUNTRY),
+                ("Various countries", LOCATION_80K),
+            ],
+            "Global": [("Remote, Global", COUNTRY), ("Global", LOCATION_80K)],
+            "Remote": [("Remote", LOCATION_TYPE), ("Remote", LOCATION_80K)],
+        }
+        for country, tags in cases.items():
+            with self.subTest(country=country):
+                self.assertEqual(list(_get_country_tags(country)), tags)
+
+
+class ImportTestCase(SyntheticImportTestCase):
+    synthetic_vacancies = 20
+
+    def setUp(self):
+        # the same records as the import of setUpTestData
+        with override_synthetic_airtable(vacancies=self.synthetic_vacancies):
+            data_raw = import_from_airtable()["data"]
+            self.data_raw = {
+                **data_raw,
+                "vacancies": list(data_raw["vacancies"]),
+                "organisations": dict(data_raw["organisations"]),
+            }
+        self.vacancies = self.data_raw["vacancies"]
+
+    def get_post(self, vacancy: dict) -> JobPost:
+        return JobPost.objects.get(id_external_80_000_hours=vacancy["id"])
+
+
+class ImportJobsTest(ImportTestCase):
+    def test_unchanged_vacancies_are_skipped(self):
+        stats = import_jobs(self.data_raw)
+        self.assertEqual(
+            (stats.created, stats.updated, stats.unchanged, stats.removed),
+            (0, 0, len(self.vacancies), 0),
+        )
+
+    def test_changed_vacancy_is_updated_in_place(self):
+        versions_count = JobPostVersion.objects.count()
+        self.vacancies[0]["Job title"] = "Changed title"
+
+        stats = import_jobs(self.data_raw)
+        self.assertEqual((stats.created, stats.updated), (0, 1))
+        self.assertEqual(stats.unchanged, len(self.vacancies) - 1)
+        post = self.get_post(self.vacancies[0])
+        self.assertEqual(post.version_current.title, "Changed title")
+        self.assertEqual(JobPostVersion.objects.count(), versions_count)
+
+    def test_new_vacancy_is_created(self):
+        self.vacancies.append({**self.vacancies[0], "id": "recVacancyNew"})
+
+        stats = import_jobs(self.data_raw)
+        self.assertEqual((stats.created, stats.updated), (1, 0))
+        post = JobPost.objects.get(id_external_80_000_hours="recVacancyNew")
+        self.assertEqual(post.version_current.status, PostStatus.PUBLISHED)
+        self.assertEqual(post.version_current.title, self.vacancies[0]["Job title"])
+        self.assertEqual(
+            post.company.id_external_80_000_hours, self.vacancies[0]["Hiring organisation ID"]
+        )
+
+    def test_removed_vacancy_is_deleted(self):
+        vacancy_removed = self.vacancies.pop(0)
+
+        stats = import_jobs(self.data_raw)
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(
+            JobPost.objects.filter(id_external_80_000_hours=vacancy_removed["id"]).exists()
+        )
+        self.assertEqual(JobPost.objects.count(), len(self.vacancies))
+
+    def test_vacancy_without_published_version_is_skipped(self):
+        post = self.get_post(self.vacancies[0])
+        JobPostVersion.objects.filter(post=post).update(status=PostStatus.HIDDEN)
+        self.vacancies[0]["Job title"] = "Changed title"
+
+        stats = import_jobs(self.data_raw)
+        self.assertEqual((stats.updated, stats.skipped), (0, 1))
+        self.assertNotEqual(JobPostVersion.objects.get(post=post).title, "Changed title")
+
+    def test_location_tag_caches_only_live_for_a_sync(self):
+        _get_city_tags("Somewhere, Else")
+        _get_country_tags("Else")
+
+        # unchanged, so no location tags are derived
+        import_jobs(self.data_raw)
+        self.assertEqual(_get_city_tags.cache_info().currsize, 0)
+        self.assertEqual(_get_country_tags.cache_info().currsize, 0)
+
+    def test_hash_version_bump_rewrites_every_vacancy(self):
+        with mock.patch("eawork.services.import_80_000_hours.IMPORT_HASH_VERSION", -1):
+            stats = import_jobs(self.data_raw)
+        self.assertEqual((stats.updated, stats.unchanged), (len(self.vacancies), 0))
+
+    def test_unchanged_companies_are_skipped(self):
+        companies = self.data_raw["organisations"]
+        stats = import_companies(self.data_raw)
+        self.assertEqual((stats.created, stats.updated, stats.unchanged), (0, 0, len(companies)))
+
+        company_id = next(iter(companies))
+        companies[company_id] = {**companies[company_id], "name": "Changed name"}
+        stats = import_companies(self.data_raw)
+        self.assertEqual((stats.updated, stats.unchanged), (1, len(companies) - 1))
+        self.assertEqual(
+            Company.objects.get(id_external_80_000_hours=company_id).name, "Changed name"
+        )
+
+
+@mock.patch("eawork.services.import_80_000_hours.enqueue_index_changes")
+class ImportIndexChangesTest(ImportTestCase):
+    def test_unchanged_import_enqueues_nothing(self, enqueue_mock):
+        import_jobs(self.data_raw)
+        enqueue_mock.assert_called_once_with(IndexChanges())
+
+    def test_changed_vacancy_enqueues_its_job_and_company(self, enqueue_mock):
+        self.vacancies[0]["Job title"] = "Changed title"
+        post = self.get_post(self.vacancies[0])
+
+        import_jobs(self.data_raw)
+        enqueue_mock.assert_called_once_with(
+            IndexChanges(jobs={post.pk}, companies={post.company_id})
+        )
+
+    def test_new_tag_is_enqueued(self, enqueue_mock):
+        self.vacancies[0]["Problem area (tags)"] = ["New area"]
+        post = self.get_post(self.vacancies[0])
+        tags_before = set(post.version_current.tags_area.values_list("pk", flat=True))
+
+        import_jobs(self.data_raw)
+        (changes,), _ = enqueue_mock.call_args
+        tag_new = JobPostTag.objects.get(name="New area")
+        self.assertEqual((changes.jobs, changes.companies), ({post.pk}, {post.company_id}))
+        # the new tag, plus the detached ones whose counts dropped
+        self.assertIn(tag_new.pk, changes.tags)
+        self.assertLessEqual(changes.tags - {tag_new.pk}, tags_before)
+
+    def test_removed_vacancy_enqueues_its_job_and_company(self, enqueue_mock):
+        post = self.get_post(self.vacancies.pop(0))
+
+        import_jobs(self.data_raw)
+        (changes,), _ = enqueue_mock.call_args
+        self.assertEqual((changes.jobs, changes.companies), ({post.pk}, {post.company_id}))
+
+    def test_changed_company_is_enqueued(self, enqueue_mock):
+        companies = self.data_raw["organisations"]
+        company_id = next(iter(companies))
+        companies[company_id] = {**companies[company_id], "name": "Changed name"}
+
+        import_companies(self.data_raw)
+        company = Company.objects.get(id_external_80_000_hours=company_id)
+        enqueue_mock.assert_called_once_with(IndexChanges(companies={company.pk}))
+
+    def test_refined_tag_link_is_enqueued(self, enqueue_mock):
+        tag = JobPostTag.objects.filter(link="").first()
+
+        refine_tags({"recTag": {"name": tag.name, "link": "https://example.org"}})
+        enqueue_mock.assert_called_once_with(IndexChanges(tags={tag.pk}))
@@ -0,0 +1,32 @@
+from eawork.services.import_benchmark import run_import_benchmark
+from eawork.tests.cases import EAWorkTestCase
+from eawork.tests.cases import create_tag_types
+
+
+class ImportBenchmarkTest(EAWorkTestCase):
+    sizes = [20, 100]
+
+    @classmethod
+    def setUpTestData(cls):
+        create_tag_types()
+
+    def test_query_count_does_not_grow_with_size(self):
+        result_small, result_big = run_import_benchmark(self.sizes, is_trace_memory=False)
+        for phase_small in result_small.phases:
+            phase_big = result_big.get_phase(phase_small.name)
+            # bulk writes are batched, so allow a few extra queries on the bigger dataset
+            self.assertLessEqual(
+                phase_big.queries, phase_small.queries + 10, msg=f"{phase_big} vs {phase_small}"
+            )
+            self.assertGreaterEqual(phase_big.rows_written, phase_small.rows_written)
+
+    def test_records_the_imported_counts(self):
+        (result,) = run_import_benchmark(self.sizes[:1], is_trace_memory=False)
+        self.assertEqual(result.size, 20)
+        self.assertEqual(result.vacancies, 20)
+        self.assertEqual(result.orgs, result.orgs_requested)
+
+    def test_unchanged_import_writes_nothing(self):
+        (result,) = run_import_benchmark(self.sizes[:1], is_trace_memory=False)
+        self.assertGreater(result.get_phase("import_jobs").rows_written, 0)
+        self.assertEqual(result.get_phase("import_jobs_unchanged").rows_written, 0)
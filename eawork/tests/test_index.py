@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from algoliasearch_django import algolia_engine
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from eawork.index import JobsIndex
+from eawork.models import JobPost
+from eawork.models import JobPostVersion
+from eawork.models import PostStatus
+from eawork.tasks import import_80_000_hours_jobs
+from eawork.tests.cases import EAWorkTestCase
+from eawork.tests.cases import create_tag_types
+from eawork.tests.cases import override_synthetic_airtable
+
+
+class JobsIndexQueriesTest(EAWorkTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_tag_types()
+
+    def setUp(self):
+        self.adapter = JobsIndex(JobPostVersion, algolia_engine.client, settings.ALGOLIA)
+
+    def test_raw_records_cost_the_same_queries_for_more_versions(self):
+        queries = []
+        for vacancies in [10, 20]:
+            with override_synthetic_airtable(vacancies=vacancies):
+                import_80_000_hours_jobs()
+            with CaptureQueriesContext(connection) as context:
+                records = self.get_raw_records()
+            self.assertEqual(len(records), vacancies)
+            queries.append(len(context.captured_queries))
+
+        self.assertEqual(queries[0], queries[1])
+        with self.assertNumQueries(queries[0]):
+            self.get_raw_records()
+
+    def get_raw_records(self) -> list[dict]:
+        return [
+            self.adapter.get_raw_record(version)
+            for version in self.adapter.get_queryset()
+            if self.adapter._should_index(version)
+        ]
+
+
+class ShouldSubmitToAlgoliaTest(EAWorkTestCase):
+    def test_queryset_agrees_with_the_instance_rule(self):
+        now = timezone.now()
+        cases = {
+            "closed less than a day ago": (dict(closes_at=now - timedelta(hours=12)), True),
+            "closed more than a day ago": (dict(closes_at=now - timedelta(days=2)), False),
+            "no closing date": (dict(closes_at=None), True),
+            "not the current version": (dict(is_current=False), False),
+            "unpublished": (dict(status=PostStatus.NEEDS_REVIEW), False),
+        }
+        versions = {name: self.create_version(**fields) for name, (fields, _) in cases.items()}
+        versions_submitted = set(JobPostVersion.objects.should_submit_to_algolia())
+
+        for name, (_, is_submitted) in cases.items():
+            with self.subTest(name):
+                self.assertEqual(versions[name].is_should_submit_to_algolia(), is_submitted)
+                self.assertEqual(versions[name] in versions_submitted, is_submitted)
+
+    def create_version(
+        self, closes_at=None, status=PostStatus.PUBLISHED, is_current=True
+    ) -> JobPostVersion:
+        post = JobPost.objects.create()
+        version = JobPostVersion.objects.create(
+            post=post, title="Title", closes_at=closes_at, status=status
+        )
+        version_current = (
+            version
+            if is_current
+            else JobPostVersion.objects.create(post=post, title="Title", closes_at=closes_at)
+        )
+        post.version_current = version_current
+        post.save()
+        return version
@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from eawork.models import Company
+from eawork.models import JobPostTag
+from eawork.models import SearchIndexEvent
+from eawork.services.index_parity import check_index_parity
+from eawork.tests.cases import EAWorkTestCase
+
+
+@override_settings(IS_ENABLE_ALGOLIA=True)
+class IndexParityTest(EAWorkTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [JobPostTag.objects.create(name=name) for name in ["a", "b", "c", "d"]]
+        cls.company = Company.objects.create(name="Company")
+
+    def setUp(self):
+        patcher = mock.patch("eawork.services.index_parity.algolia_engine")
+        algolia_engine = patcher.start()
+        self.addCleanup(patcher.stop)
+        algolia_engine.get_adapter.side_effect = lambda model: mock.Mock(
+            index_name=model._meta.label
+        )
+        tag_a, _, _, tag_d = self.tags
+        # b and c are missing, d was deleted and -1 never existed
+        self.object_ids_indexed = {
+            JobPostTag._meta.label: [tag_a.pk, tag_d.pk, -1],
+            Company._meta.label: [str(self.company.pk)],
+        }
+        algolia_engine.client.init_index.side_effect = lambda index_name: mock.Mock(
+            browse_objects=lambda params: [
+                {"objectID": object_id}
+                for object_id in self.object_ids_indexed.get(index_name, [])
+            ]
+        )
+        JobPostTag.objects.filter(pk=tag_d.pk).delete()
+        # only c and d are about to be pushed, whatever the writes above enqueued
+        SearchIndexEvent.objects.all().delete()
+        for tag in self.tags[2:]:
+            SearchIndexEvent.objects.create(model=JobPostTag._meta.label, object_id=tag.pk)
+
+    def test_diff_leaves_out_the_pending_objects(self):
+        reports = {report.index_name: report for report in check_index_parity()}
+
+        report = reports[JobPostTag._meta.label]
+        self.assertEqual((report.records, report.records_expected), (3, 3))
+        self.assertEqual(report.object_ids_missing, {str(self.tags[1].pk)})
+        self.assertEqual(report.object_ids_extra, {"-1"})
+        self.assertEqual(report.records_pending, 2)
+        self.assertTrue(reports[Company._meta.label].is_ok())
+        self.assertEqual(SearchIndexEvent.objects.count(), 2)
+
+    def test_repair_enqueues_the_missing_and_extra_records(self):
+        events_before = set(SearchIndexEvent.objects.values_list("pk", flat=True))
+
+        check_index_parity(is_repair=True)
+        self.assertEqual(
+            set(
+                SearchIndexEvent.objects.exclude(pk__in=events_before).values_list(
+                    "model", "object_id"
+                )
+            ),
+            {(JobPostTag._meta.label, str(self.tags[1].pk)), (JobPostTag._meta.label, "-1")},
+        )
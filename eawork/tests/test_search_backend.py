@@ -0,0 +1,95 @@
+from unittest import mock
+
+from eawork.models import JobPostTag
+from eawork.models import JobPostVersion
+from eawork.services.search_backend import AlgoliaSearchBackend
+from eawork.services.search_backend import LocalSearchBackend
+from eawork.tests.cases import SyntheticImportTestCase
+
+
+class LocalSearchBackendTest(SyntheticImportTestCase):
+    def setUp(self):
+        self.search = LocalSearchBackend()
+        self.versions = JobPostVersion.objects.should_submit_to_algolia()
+
+    def test_empty_query_returns_all_jobs(self):
+        res = self.search.search("", {"hitsPerPage": 1000})
+        self.assertEqual(res["nbHits"], self.versions.count())
+        self.assertEqual(
+            {hit["objectID"] for hit in res["hits"]},
+            set(self.versions.values_list("post_id", flat=True)),
+        )
+
+    def test_facet_filters(self):
+        # the tags_area attribute holds the tags_area_filter tags
+        tags = JobPostTag.objects.filter(tags_area_filter__in=self.versions).distinct()
+        tag, tag_other = tags[:2]
+        res = self.search.search("", {"facetFilters": [f"tags_area:{tag.name}"]})
+        self.assertEqual(res["nbHits"], self.versions.filter(tags_area_filter=tag).count())
+
+        res = self.search.search(
+            "", {"facetFilters": [[f"tags_area:{tag.name}", f"tags_area:{tag_other.name}"]]}
+        )
+        versions_any = self.versions.filter(tags_area_filter__in=[tag, tag_other]).distinct()
+        self.assertEqual(res["nbHits"], versions_any.count())
+
+    def test_query_and_numeric_filters(self):
+        version = self.versions.order_by("posted_at").last()
+        res = self.search.search(version.title[:-1], {"hitsPerPage": 1000})
+        self.assertIn(version.post_id, [hit["objectID"] for hit in res["hits"]])
+
+        posted_at = version.posted_at.replace(microsecond=0)  # the records have timestamps
+        res = self.search.search("", {"filters": f"posted_at >= {posted_at.timestamp()}"})
+        self.assertEqual(res["nbHits"], self.versions.filter(posted_at__gte=posted_at).count())
+
+
+class CappedSearchBackend(LocalSearchBackend):
+    """Like Algolia with `paginationLimitedTo`, the pages past `hits_max` are empty."""
+
+    hits_max = 10
+
+    def search(self, query: str = "", params: dict = None) -> dict:
+        res = super().search(query, params)
+        res["nbPages"] = min(res["nbPages"], self.hits_max // res["hitsPerPage"])
+        return res
+
+
+class BrowseTest(SyntheticImportTestCase):
+    def test_returns_every_hit(self):
+        hits = LocalSearchBackend().browse("", {"hitsPerPage": 3})
+        self.assertEqual(
+            sorted(hit["objectID"] for hit in hits),
+            sorted(
+                JobPostVersion.objects.should_submit_to_algolia().values_list(
+                    "post_id", flat=True
+                )
+            ),
+        )
+
+    def test_raises_if_the_search_is_truncated(self):
+        search = CappedSearchBackend()
+        self.assertEqual(
+            len(search.browse("", {"hitsPerPage": 5, "filters": "posted_at < 0"})), 0
+        )
+        with self.assertRaisesRegex(RuntimeError, r"returned 10 of \d+ hits"):
+            search.browse("", {"hitsPerPage": 5})
+
+    def test_ranked_search_completes_a_truncated_search_by_browsing(self):
+        search = CappedSearchBackend()
+        hits_all = LocalSearchBackend().search("", {"hitsPerPage": 1000})["hits"]
+        with mock.patch.object(search, "browse", return_value=hits_all[::-1]):
+            hits = search.search_ranked("", {"hitsPerPage": 5})
+
+        object_ids = [hit["objectID"] for hit in hits]
+        # the ranked first ones, then the rest in browse order
+        self.assertEqual(object_ids[:10], [hit["objectID"] for hit in hits_all[:10]])
+        self.assertEqual(object_ids[10:], [hit["objectID"] for hit in hits_all[:9:-1]])
+
+    @mock.patch("eawork.services.search_backend.algolia_engine")
+    def test_algolia_uses_the_browse_api(self, algolia_engine):
+        index = algolia_engine.client.init_index.return_value
+        index.browse_objects.return_value = iter([{"objectID": 1}, {"objectID": 2}])
+
+        hits = AlgoliaSearchBackend().browse("", {"filters": "posted_at > 0", "page": 3})
+        self.assertEqual(hits, [{"objectID": 1}, {"objectID": 2}])
+        index.browse_objects.assert_called_once_with({"filters": "posted_at > 0", "query": ""})
@@ -0,0 +1,215 @@
+from collections import defaultdict
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone as django_timezone
+
+from eawork.models import Company
+from eawork.models import ImportState
+from eawork.models import JobPost
+from eawork.models import JobPostTag
+from eawork.models import JobPostVersion
+from eawork.models import SearchIndexEvent
+from eawork.services.search_index import INDEXED_MODELS
+from eawork.services.search_index import PUSH_CLAIM_TIMEOUT
+from eawork.services.search_index import delete_expired_jobs
+from eawork.services.search_index import get_retry_delay
+from eawork.services.search_index import push_index_events
+from eawork.services.search_index import reindex_blue_green
+from eawork.tasks import sweep_expired_jobs
+from eawork.tests.cases import EAWorkTestCase
+
+
+class RetryDelayTest(EAWorkTestCase):
+    def test_doubles_up_to_the_max(self):
+        self.assertEqual(
+            [get_retry_delay(attempts).total_seconds() for attempts in range(1, 10)],
+            [30, 60, 120, 240, 480, 960, 1920, 3600, 3600],
+        )
+
+
+# the events are about objects that don't exist, so every push is a delete of their records
+class PushIndexEventsTest(EAWorkTestCase):
+    def setUp(self):
+        patcher = mock.patch("eawork.services.search_index.algolia_engine")
+        self.algolia_engine = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.algolia_engine.get_adapter.side_effect = lambda model: mock.MagicMock(
+            index_name=model._meta.label
+        )
+        self.indices = defaultdict(mock.Mock)
+        self.algolia_engine.client.init_index.side_effect = self.indices.__getitem__
+
+    def enqueue(self, model, *object_ids: str, **fields) -> list[SearchIndexEvent]:
+        return [
+            SearchIndexEvent.objects.create(
+                model=model._meta.label, object_id=object_id, **fields
+            )
+            for object_id in object_ids
+        ]
+
+    def get_deleted(self, model) -> list[set[str]]:
+        return [
+            set(call.args[0])
+            for call in self.indices[model._meta.label].delete_objects.call_args_list
+        ]
+
+    def test_repeated_events_collapse(self):
+        self.enqueue(JobPostTag, "-1", "-2", "-1", "-1")
+        self.enqueue(Company, "-1")
+
+        self.assertEqual(push_index_events(), 5)
+        self.assertEqual(self.get_deleted(JobPostTag), [{"-1", "-2"}])
+        self.assertEqual(self.get_deleted(Company), [{"-1"}])
+        self.assertFalse(SearchIndexEvent.objects.exists())
+
+    def test_failed_model_is_retried_without_holding_back_the_others(self):
+        self.enqueue(JobPostVersion, "-1")
+        (event_failed,) = self.enqueue(JobPostTag, "-1", attempts=2)
+        self.indices[JobPostTag._meta.label].delete_objects.side_effect = ConnectionError()
+
+        now = django_timezone.now()
+        self.assertEqual(push_index_events(), 2)
+        self.assertEqual(self.get_deleted(JobPostVersion), [{"-1"}])
+        event_failed = SearchIndexEvent.objects.get()
+        self.assertEqual(event_failed.attempts, 3)
+        self.assertAlmostEqual(
+            event_failed.retry_at, now + get_retry_delay(3), delta=timedelta(seconds=5)
+        )
+
+        # not due yet
+        self.assertEqual(push_index_events(), 0)
+
+    def test_batch_is_claimed_during_the_push(self):
+        events = self.enqueue(JobPostTag, "-1", "-2", "-3")
+        retry_at_pushing = []
+        self.indices[
+            JobPostTag._meta.label
+        ].delete_objects.side_effect = lambda object_ids: retry_at_pushing.extend(
+            SearchIndexEvent.objects.order_by("pk").values_list("retry_at", flat=True)
+        )
+
+        now = django_timezone.now()
+        self.assertEqual(push_index_events(batch_size=2), 2)
+        self.assertEqual(self.get_deleted(JobPostTag), [{"-1", "-2"}])
+        # the claimed two are leased, the third one is still due
+        self.assertEqual(len(retry_at_pushing), 3)
+        for retry_at in retry_at_pushing[:2]:
+            self.assertAlmostEqual(
+                retry_at, now + PUSH_CLAIM_TIMEOUT, delta=timedelta(seconds=5)
+            )
+        self.assertEqual(retry_at_pushing[2], events[2].retry_at)
+        self.assertEqual(list(SearchIndexEvent.objects.all()), events[2:])
+
+
+class ReindexBlueGreenTest(EAWorkTestCase):
+    index_names = [model._meta.label for model in INDEXED_MODELS]
+    tmp_index_names = [f"{index_name}_tmp" for index_name in index_names]
+
+    def setUp(self):
+        patcher = mock.patch("eawork.services.search_index.algolia_engine")
+        self.algolia_engine = patcher.start()
+        self.addCleanup(patcher.stop)
+        # no rows to index, so every index should report 0 records
+        self.algolia_engine.get_adapter.side_effect = lambda model: mock.MagicMock(
+            index_name=model._meta.label
+        )
+        self.indices = defaultdict(mock.MagicMock)
+        self.algolia_engine.client.init_index.side_effect = self.indices.__getitem__
+        for index_name in self.tmp_index_names:
+            self.indices[index_name].search.return_value = {"nbHits": 0}
+
+    def get_deleted(self) -> set[str]:
+        return {name for name, index in self.indices.items() if index.delete.called}
+
+    def test_complete_indices_are_moved_into_place(self):
+        results = reindex_blue_green()
+
+        self.assertTrue(all(result.is_valid() for result in results))
+        self.assertEqual(
+            self.algolia_engine.client.move_index.call_args_list,
+            [mock.call(tmp, name) for tmp, name in zip(self.tmp_index_names, self.index_names)],
+        )
+        self.assertEqual(self.get_deleted(), set())
+
+    def test_count_mismatch_leaves_the_live_indices_alone(self):
+        self.indices[self.tmp_index_names[1]].search.return_value = {"nbHits": 5}
+
+        results = reindex_blue_green()
+
+        self.assertEqual([result.is_valid() for result in results], [True, False, True])
+        self.algolia_engine.client.move_index.assert_not_called()
+        self.assertEqual(self.get_deleted(), set(self.tmp_index_names))
+
+    def test_failed_build_deletes_every_temporary_index(self):
+        self.indices[self.tmp_index_names[2]].clear_objects.side_effect = ConnectionError()
+
+        with self.assertRaises(ConnectionError):
+            reindex_blue_green()
+
+        self.algolia_engine.client.move_index.assert_not_called()
+        self.assertEqual(self.get_deleted(), set(self.tmp_index_names))
+
+
+class DeleteExpiredJobsTest(EAWorkTestCase):
+    until = datetime(2024, 5, 10, 12, tzinfo=timezone.utc)
+    since = datetime(2024, 5, 9, 12, tzinfo=timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        # by the hours before `until` that they closed
+        cls.posts = {
+            hours: cls.create_post(cls.until - timedelta(hours=hours))
+            for hours in [23, 24, 25, 47, 48, 49]
+        }
+
+    @classmethod
+    def create_post(cls, closes_at: datetime) -> JobPost:
+        post = JobPost.objects.create()
+        post.version_current = JobPostVersion.objects.create(
+            post=post, title="Title", closes_at=closes_at
+        )
+        post.save()
+        return post
+
+    def get_deleted(self, since: datetime | None) -> set[int]:
+        with mock.patch("eawork.services.search_index._push") as push_mock:
+            count = delete_expired_jobs(since, self.until)
+        (model, records, object_ids), _ = push_mock.call_args
+        self.assertEqual((model, records, count), (JobPostVersion, [], len(object_ids)))
+        hours_by_post_pk = {str(post.pk): hours for hours, post in self.posts.items()}
+        return {hours_by_post_pk[object_id] for object_id in object_ids}
+
+    def test_expired_a_day_after_closing_since_the_last_sweep(self):
+        # closed in [since - 1 day, until - 1 day)
+        self.assertEqual(self.get_deleted(self.since), {25, 47, 48})
+
+    def test_first_sweep_has_no_lower_bound(self):
+        self.assertEqual(self.get_deleted(None), {25, 47, 48, 49})
+
+    def test_old_versions_are_left_alone(self):
+        post = self.posts[25]
+        post.version_current = JobPostVersion.objects.create(post=post, title="Title")
+        post.save()
+        self.assertEqual(self.get_deleted(self.since), {47, 48})
+
+
+@override_settings(IS_ENABLE_ALGOLIA=True)
+class SweepExpiredJobsTest(EAWorkTestCase):
+    def test_keeps_the_import_watermark(self):
+        synced_at = django_timezone.now()
+
+        # an import that finishes during the sweep
+        def import_meanwhile(expired_since, expired_until):
+            ImportState.objects.update(airtable_synced_at=synced_at)
+            return 0
+
+        ImportState.get_solo()
+        with mock.patch("eawork.tasks.delete_expired_jobs", side_effect=import_meanwhile):
+            sweep_expired_jobs()
+        import_state = ImportState.get_solo()
+        self.assertEqual(import_state.airtable_synced_at, synced_at)
+        self.assertIsNotNone(import_state.jobs_expired_until)
@@ -0,0 +1,96 @@
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.test import override_settings
+
+from eawork.send_email import EMAIL_BATCH_SIZE
+from eawork.send_email import build_email
+from eawork.send_email import send_emails
+from eawork.tests.cases import EAWorkTestCase
+
+
+class PartlyFailingEmailBackend(locmem.EmailBackend):
+    """Fails the messages to "fail@", and reports the ones to "rejected@" like anymail does."""
+
+    connections_opened = 0
+
+    def open(self):
+        PartlyFailingEmailBackend.connections_opened += 1
+        return True
+
+    def send_messages(self, messages) -> int:
+        messages_sent = [msg for msg in messages if not msg.to[0].startswith("fail@")]
+        for msg in messages_sent:
+            if msg.to[0].startswith("rejected@"):
+                msg.anymail_status = SimpleNamespace(status={"rejected"})
+        return super().send_messages(messages_sent)
+
+
+@override_settings(EMAIL_BACKEND="eawork.tests.test_send_email.PartlyFailingEmailBackend")
+class SendEmailsTest(EAWorkTestCase):
+    def build_email(self, email_to: str):
+        return build_email(subject="Subject", email_to=[email_to], content_html="<p>Text</p>")
+
+    def test_reports_each_message(self):
+        PartlyFailingEmailBackend.connections_opened = 0
+        emails_to = [
+            "a@example.org",
+            "fail@example.org",
+            "rejected@example.org",
+            "b@example.org",
+        ]
+
+        is_sent = send_emails([self.build_email(email_to) for email_to in emails_to])
+        self.assertEqual(is_sent, [True, False, False, True])
+        self.assertEqual(PartlyFailingEmailBackend.connections_opened, 1)
+        self.assertEqual(
+            [email.to[0] for email in mail.outbox],
+            ["a@example.org", "rejected@example.org", "b@example.org"],
+        )
+
+    def test_no_messages(self):
+        self.assertEqual(send_emails([]), [])
+
+
+@override_settings(
+    EMAIL_BACKEND="anymail.backends.postmark.EmailBackend",
+    ANYMAIL={"POSTMARK_SERVER_TOKEN": "token"},
+)
+class SendEmailsPostmarkTest(EAWorkTestCase):
+    def build_email(self, email_to: str):
+        return build_email(subject="Subject", email_to=[email_to], content_html="<p>Text</p>")
+
+    def respond(self, method: str, url: str, data: str, **kwargs):
+        """Like Postmark's /email/batch, fails the messages to "fail@" as inactive."""
+        response = mock.Mock()
+        response.json.return_value = [
+            {"ErrorCode": 406 if message["To"].startswith("fail@") else 0, "Message": ""}
+            for message in json.loads(data)
+        ]
+        return response
+
+    @mock.patch("requests.Session.request", autospec=True)
+    def test_posts_the_messages_in_batches(self, request_mock):
+        request_mock.side_effect = lambda session, **kwargs: self.respond(**kwargs)
+        emails_to = [f"{i}@example.org" for i in range(EMAIL_BATCH_SIZE)]
+        emails_to += ["fail@example.org", "a@example.org"]
+
+        is_sent = send_emails([self.build_email(email_to) for email_to in emails_to])
+        self.assertEqual(is_sent, [True] * EMAIL_BATCH_SIZE + [False, True])
+        self.assertEqual(request_mock.call_count, 2)
+        for call in request_mock.call_args_list:
+            self.assertEqual(call.kwargs["url"], "https://api.postmarkapp.com/email/batch")
+            self.assertEqual(call.kwargs["headers"]["X-Postmark-Server-Token"], "token")
+        self.assertEqual(
+            [message["To"] for message in json.loads(request_mock.call_args.kwargs["data"])],
+            ["fail@example.org", "a@example.org"],
+        )
+
+    @mock.patch("requests.Session.request", side_effect=requests.ConnectionError)
+    def test_failed_batch_reports_its_messages(self, request_mock):
+        is_sent = send_emails([self.build_email("a@example.org")])
+        self.assertEqual(is_sent, [False])
@@ -0,0 +1,63 @@
+import threading
+import time
+from itertools import count
+
+from django.test import SimpleTestCase
+
+from eawork.services.streaming import prefetch
+
+
+class PrefetchTest(SimpleTestCase):
+    def test_streams_are_fetched_at_the_same_time(self):
+        started = {"orgs": threading.Event(), "vacancies": threading.Event()}
+
+        def fetch(name: str, other: str):
+            started[name].set()
+            # only true if the other stream is fetched before this one is consumed to the end
+            yield started[other].wait(timeout=2)
+
+        orgs = prefetch(fetch("orgs", other="vacancies"))
+        vacancies = prefetch(fetch("vacancies", other="orgs"))
+        self.assertEqual(list(orgs), [True])
+        self.assertEqual(list(vacancies), [True])
+
+    def test_stays_bounded_ahead_of_the_consumer(self):
+        produced = []
+
+        def produce():
+            for number in count():
+                produced.append(number)
+                yield number
+
+        items = prefetch(produce(), size=5)
+        time.sleep(0.3)
+        # the full queue, plus the item waiting to be put
+        self.assertEqual(len(produced), 5 + 1)
+
+        self.assertEqual([next(items) for _ in range(3)], [0, 1, 2])
+        time.sleep(0.3)
+        self.assertEqual(len(produced), 5 + 1 + 3)
+        items.close()
+
+    def test_producer_stops_when_the_iterator_is_dropped(self):
+        is_stopped = threading.Event()
+
+        def produce():
+            try:
+                yield from count()
+            finally:
+                is_stopped.set()
+
+        items = prefetch(produce(), size=5)
+        del items
+        self.assertTrue(is_stopped.wait(timeout=2))
+
+    def test_producer_errors_are_raised_in_the_consumer(self):
+        def produce():
+            yield 1
+            raise ValueError("fetch failed")
+
+        items = prefetch(produce())
+        self.assertEqual(next(items), 1)
+        with self.assertRaisesRegex(ValueError, "fetch failed"):
+            next(items)
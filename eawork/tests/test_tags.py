@@ -0,0 +1,128 @@
+from eawork.models import Company
+from eawork.models import JobPost
+from eawork.models import JobPostTag
+from eawork.models import JobPostTagTypeEnum
+from eawork.models import JobPostVersion
+from eawork.services.tags import TagRegistry
+from eawork.services.tags import disable_tag_count_events
+from eawork.services.tags import refresh_tag_counts
+from eawork.services.tags import sync_tags
+from eawork.tests.cases import EAWorkTestCase
+from eawork.tests.cases import create_tag_types
+
+
+class SyncTagsTest(EAWorkTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_tag_types()
+        cls.tags = {name: JobPostTag.objects.create(name=name) for name in ["a", "b", "c"]}
+        cls.company = Company.objects.create(name="Company")
+        cls.company.tags_areas.set([cls.tags["a"], cls.tags["b"]])
+        cls.company.tags_locations.set([cls.tags["a"]])
+        cls.company_other = Company.objects.create(name="Company other")
+        cls.company_other.tags_areas.set([cls.tags["a"]])
+
+    def test_only_the_differences_are_written(self):
+        through = Company.tags_areas.through
+        row_kept = through.objects.get(company=self.company, jobposttag=self.tags["b"])
+
+        tags_changed = sync_tags(
+            Company, ["tags_areas"], {self.company.pk: {"tags_areas": ["b", "C"]}}, TagRegistry()
+        )
+
+        self.assertEqual(tags_changed, {self.tags["a"].pk, self.tags["c"].pk})
+        self.assertEqual(set(self.company.tags_areas.values_list("name", flat=True)), {"b", "c"})
+        self.assertTrue(through.objects.filter(pk=row_kept.pk).exists())
+        # the other fields and instances are left alone
+        self.assertEqual(list(self.company.tags_locations.all()), [self.tags["a"]])
+        self.assertEqual(list(self.company_other.tags_areas.all()), [self.tags["a"]])
+
+    def test_unchanged_tags_write_nothing(self):
+        registry = TagRegistry()
+        # only the read of the current rows
+        with self.assertNumQueries(1):
+            tags_changed = sync_tags(
+                Company, ["tags_areas"], {self.company.pk: {"tags_areas": ["a", "b"]}}, registry
+            )
+        self.assertEqual(tags_changed, set())
+
+
+class TagRegistryTest(EAWorkTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_tag_types()
+
+    def test_rollback_forgets_the_flushed_tags(self):
+        registry = TagRegistry()
+        with self.assertRaises(ValueError):
+            with registry.atomic():
+                registry.add("New", JobPostTagTypeEnum.AREA)
+                registry.flush()
+                self.assertIsNotNone(registry.get("New"))
+                raise ValueError()
+        self.assertIsNone(registry.get("New"))
+
+        registry.add("New", JobPostTagTypeEnum.AREA)
+        self.assertEqual(registry.flush(), {JobPostTag.objects.get(name="New").pk})
+        self.assertEqual(
+            list(JobPostTag.objects.get(name="New").types.values_list("type", flat=True)),
+            [JobPostTagTypeEnum.AREA],
+        )
+
+
+class TagCountEventsTest(EAWorkTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = {name: JobPostTag.objects.create(name=name) for name in ["a", "b", "c"]}
+        # the refresh would only run once the class' transaction commits, ie never
+        with disable_tag_count_events():
+            cls.post = JobPost.objects.create()
+            cls.version = JobPostVersion.objects.create(post=cls.post, title="Title")
+            cls.version.tags_area.set([cls.tags["a"]])
+            cls.post.version_current = cls.version
+            cls.post.save()
+        refresh_tag_counts()
+
+    def get_counts(self) -> dict[str, int]:
+        return dict(JobPostTag.objects.values_list("name", "job_count"))
+
+    def test_new_version_refreshes_the_tags_of_both_versions(self):
+        # stale, but not a tag of either version
+        JobPostTag.objects.filter(pk=self.tags["c"].pk).update(job_count=5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            version_new = JobPostVersion.objects.create(post=self.post, title="Title")
+            version_new.tags_area.set([self.tags["b"]])
+            self.post.version_current = version_new
+            self.post.save()
+        self.assertEqual(self.get_counts(), {"a": 0, "b": 1, "c": 5})
+
+    def test_counts_are_refreshed_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.version.tags_area.add(self.tags["b"])
+            self.version.tags_exp_required.add(self.tags["c"])
+            self.version.tags_area.remove(self.tags["a"])
+            self.assertEqual(self.get_counts(), {"a": 1, "b": 0, "c": 0})
+
+        self.assertEqual(self.get_counts(), {"a": 0, "b": 1, "c": 1})
+
+    def test_save_of_the_same_version_only_updates_the_post(self):
+        post = JobPost.objects.get(pk=self.post.pk)
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            post.save()
+        self.assertEqual(callbacks, [])
+
+    def test_clear_refreshes_the_removed_tags(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.version.tags_area.clear()
+        self.assertEqual(self.get_counts()["a"], 0)
+
+    def test_deleted_post_refreshes_its_tags(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        self.assertEqual(self.get_counts()["a"], 0)
+
+    def test_disabled_during_bulk_writes(self):
+        with disable_tag_count_events(), self.captureOnCommitCallbacks() as callbacks:
+            self.post.delete()
+        self.assertEqual(callbacks, [])